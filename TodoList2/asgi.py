@@ -2,6 +2,8 @@
 ASGI config for TodoList2 project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Live to-do events (``/todos/api/todos/events``) are only served here, e.g.
+``uvicorn TodoList2.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -14,3 +16,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TodoList2.settings')
 
 application = get_asgi_application()
+
+from todos.events import EventStreamApp  # noqa: E402
+
+application = EventStreamApp(application)
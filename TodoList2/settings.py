@@ -10,9 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 import os
-from decouple import config
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -53,6 +55,17 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Opt-in request instrumentation (Server-Timing header, JSON log lines on
+# the "todos.timing" logger, /todos/api/timing_stats). Percentiles are kept
+# per process over the last TODOS_TIMING_SAMPLE_SIZE requests of each URL.
+TODOS_REQUEST_TIMING = config("TODOS_REQUEST_TIMING", default=False, cast=bool)
+TODOS_TIMING_SAMPLE_SIZE = config("TODOS_TIMING_SAMPLE_SIZE", default=1000, cast=int)
+TODOS_TIMING_DUPLICATE_THRESHOLD = config(
+    "TODOS_TIMING_DUPLICATE_THRESHOLD", default=3, cast=int
+)
+if TODOS_REQUEST_TIMING:
+    MIDDLEWARE.insert(0, "todos.middleware.RequestTimingMiddleware")
+
 ROOT_URLCONF = "TodoList2.urls"
 
 TEMPLATES = [
@@ -81,14 +94,148 @@ WSGI_APPLICATION = "TodoList2.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
-        "NAME": "todos",
-        "USER": "postgres",
+        "ENGINE": config("DB_ENGINE", default="django.db.backends.postgresql"),
+        "NAME": config("DB_NAME", default="todos"),
+        "USER": config("DB_USER", default="postgres"),
         "PASSWORD": config("DB_PASSWORD"),
         "HOST": config("DB_HOST"),
+        "PORT": config("DB_PORT", default=""),
+        "CONN_HEALTH_CHECKS": config("DB_CONN_HEALTH_CHECKS", default=True, cast=bool),
+        "OPTIONS": {},
+    }
+}
+
+# Connection reuse, off by default. The two options are mutually exclusive:
+# - ASGI: set DB_POOL to share a psycopg 3 pool between the threads of a
+#   process (requires Django 5.1+ and psycopg[pool]). Under ASGI each request
+#   may run on a new thread, and CONN_MAX_AGE would leave one connection
+#   open per thread that ever ran one.
+# - WSGI (a fixed number of worker threads): either DB_POOL or DB_CONN_MAX_AGE,
+#   seconds to keep each thread's connection open between requests.
+# CONN_HEALTH_CHECKS applies to both: pooled connections are checked out
+# through ConnectionPool.check_connection.
+if config("DB_POOL", default=False, cast=bool):
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": config("DB_POOL_MIN_SIZE", default=2, cast=int),
+        "max_size": config("DB_POOL_MAX_SIZE", default=10, cast=int),
+        "timeout": config("DB_POOL_TIMEOUT", default=10, cast=float),
+        "max_idle": config("DB_POOL_MAX_IDLE", default=300, cast=float),
+        "max_lifetime": config("DB_POOL_MAX_LIFETIME", default=3600, cast=float),
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = config(
+        "DB_CONN_MAX_AGE", default=0, cast=int
+    )
+
+# Read replicas. DB_REPLICAS lists one location per replica, a host for
+# PostgreSQL or a database file for SQLite; every other setting is copied
+# from "default". Each request reads from one randomly chosen replica. A
+# request that writes pins its session to the primary for
+# TODOS_PRIMARY_STICKY_SECONDS so the user reads their own writes.
+DB_LOCATION_KEY = "NAME" if "sqlite" in DATABASES["default"]["ENGINE"] else "HOST"
+DB_REPLICAS = config("DB_REPLICAS", default="", cast=Csv())
+TODOS_READ_REPLICAS = []
+for index, location in enumerate(DB_REPLICAS, start=1):
+    DATABASES[f"replica{index}"] = {
+        **DATABASES["default"],
+        DB_LOCATION_KEY: location,
+        "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+        "TEST": {"MIRROR": "default"},
     }
+    TODOS_READ_REPLICAS.append(f"replica{index}")
+TODOS_PRIMARY_STICKY_SECONDS = config(
+    "TODOS_PRIMARY_STICKY_SECONDS", default=10, cast=int
+)
+
+# User sharding. DB_SHARDS lists extra databases, located like replicas,
+# that hold to-dos, archived to-dos, counters and uploads; users, sessions
+# and the shard map stay on "default". New users are spread round-robin
+# over "default" and the shards, users from before sharding stay on
+# "default", and rebalanceshards moves users between them. Only ever append
+# to DB_SHARDS: a shard's position fixes the range of to-do ids it uses.
+# The shard map is cached, and rebalanceshards updates it from its own
+# process, so sharding needs a cache shared by every process (not locmem).
+DB_SHARDS = config("DB_SHARDS", default="", cast=Csv())
+TODOS_SHARDS = []
+for index, location in enumerate(DB_SHARDS, start=1):
+    DATABASES[f"shard{index}"] = {
+        **DATABASES["default"],
+        DB_LOCATION_KEY: location,
+        "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+    }
+    TODOS_SHARDS.append(f"shard{index}")
+if TODOS_SHARDS:
+    TODOS_SHARDS.insert(0, "default")
+
+DATABASE_ROUTERS = []
+if TODOS_SHARDS:
+    DATABASE_ROUTERS.append("todos.routers.ShardRouter")
+if TODOS_READ_REPLICAS:
+    DATABASE_ROUTERS.append("todos.routers.ReplicaRouter")
+if DATABASE_ROUTERS:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.contrib.sessions.middleware.SessionMiddleware") + 1,
+        "todos.middleware.DatabaseRoutingMiddleware",
+    )
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
 }
 
+CACHE_BACKEND = config("CACHE_BACKEND", default="locmem")
+
+# LOCATION is a name for locmem, a directory for file and a URL for redis.
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        "LOCATION": config("CACHE_LOCATION", default="todos"),
+    }
+}
+if CACHE_BACKEND != "redis":
+    CACHES["default"]["OPTIONS"] = {
+        "MAX_ENTRIES": config("CACHE_MAX_ENTRIES", default=10000, cast=int),
+    }
+
+if TODOS_SHARDS and CACHE_BACKEND == "locmem":
+    raise ImproperlyConfigured(
+        "DB_SHARDS needs a cache shared by all processes; set CACHE_BACKEND "
+        "to redis, or file for processes on one host."
+    )
+
+TODOS_CACHE_ALIAS = "default"
+TODOS_CACHE_TIMEOUT = config("TODOS_CACHE_TIMEOUT", default=600, cast=int)
+
+# Cached pages are invalidated by bumping a per-user version in the cache,
+# so every process serving requests, and every management command that
+# writes to-dos (importtodos, archivetodos, ...), must see the same cache:
+# redis, or file for processes on one host. locmem is private to each
+# process, so there pages are not cached at all unless TODOS_CACHE_SHARED
+# says the server runs a single process.
+TODOS_CACHE_SHARED = config(
+    "TODOS_CACHE_SHARED", default=CACHE_BACKEND != "locmem", cast=bool
+)
+
+# Sessions are read from the cache and written through to the database, so
+# an evicted cache entry never logs anyone out. A logout only clears the
+# cached copy in the cache it runs against, so without a shared cache
+# sessions are read from the database.
+SESSION_ENGINE = config(
+    "SESSION_ENGINE",
+    default=(
+        "django.contrib.sessions.backends.cached_db"
+        if TODOS_CACHE_SHARED
+        else "django.contrib.sessions.backends.db"
+    ),
+)
+SESSION_CACHE_ALIAS = TODOS_CACHE_ALIAS
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -110,6 +257,55 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = "todos.User"
 
+# The authenticated user is cached per process for TODOS_USER_CACHE_TTL
+# seconds, so ordinary requests need no user query (see todos.backends).
+# Saves, password changes and logouts reach the other processes through a
+# version in the cache, so this needs TODOS_CACHE_SHARED as well.
+AUTHENTICATION_BACKENDS = ["todos.backends.CachedUserBackend"]
+TODOS_USER_CACHE_TTL = config("TODOS_USER_CACHE_TTL", default=30, cast=int)
+TODOS_USER_CACHE_SIZE = config("TODOS_USER_CACHE_SIZE", default=10000, cast=int)
+
+# Password hashing. PASSWORD_HASHER picks the algorithm new hashes use; the
+# others stay listed so existing hashes still verify. Changing the algorithm
+# or its cost rehashes a user's password on their next successful login.
+# A TODOS_PBKDF2_ITERATIONS of 0 keeps Django's default iteration count.
+# Argon2 needs the argon2-cffi package.
+TODOS_PASSWORD_HASHERS = {
+    "pbkdf2": "todos.hashers.PBKDF2PasswordHasher",
+    "argon2": "todos.hashers.Argon2PasswordHasher",
+    "scrypt": "todos.hashers.ScryptPasswordHasher",
+}
+PASSWORD_HASHER = config("PASSWORD_HASHER", default="pbkdf2")
+PASSWORD_HASHERS = [TODOS_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in TODOS_PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
+PASSWORD_HASHERS += [
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+]
+TODOS_PBKDF2_ITERATIONS = config("TODOS_PBKDF2_ITERATIONS", default=0, cast=int)
+TODOS_ARGON2_TIME_COST = config("TODOS_ARGON2_TIME_COST", default=2, cast=int)
+TODOS_ARGON2_MEMORY_COST = config("TODOS_ARGON2_MEMORY_COST", default=102400, cast=int)
+TODOS_SCRYPT_WORK_FACTOR = config("TODOS_SCRYPT_WORK_FACTOR", default=2**14, cast=int)
+
+# Login, registration and password views are throttled with token buckets
+# per client IP and per targeted account (username or email), shared through
+# the cache: BURST attempts at once, refilled at PER_MINUTE a minute. Behind
+# a proxy, set TODOS_CLIENT_IP_HEADER (e.g. HTTP_X_REAL_IP) to the META key
+# carrying the client address.
+TODOS_THROTTLE_ENABLED = config("TODOS_THROTTLE_ENABLED", default=True, cast=bool)
+TODOS_THROTTLE_IP_BURST = config("TODOS_THROTTLE_IP_BURST", default=20, cast=int)
+TODOS_THROTTLE_IP_PER_MINUTE = config(
+    "TODOS_THROTTLE_IP_PER_MINUTE", default=10, cast=float
+)
+TODOS_THROTTLE_ACCOUNT_BURST = config(
+    "TODOS_THROTTLE_ACCOUNT_BURST", default=5, cast=int
+)
+TODOS_THROTTLE_ACCOUNT_PER_MINUTE = config(
+    "TODOS_THROTTLE_ACCOUNT_PER_MINUTE", default=2, cast=float
+)
+TODOS_CLIENT_IP_HEADER = config("TODOS_CLIENT_IP_HEADER", default="")
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
@@ -132,3 +328,105 @@ STATIC_URL = "/static/"
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# To-do list pagination
+
+TODOS_PAGE_SIZE = config("TODOS_PAGE_SIZE", default=50, cast=int)
+
+TODOS_EXPORT_CHUNK_SIZE = config("TODOS_EXPORT_CHUNK_SIZE", default=2000, cast=int)
+
+TODOS_IMPORT_BATCH_SIZE = config("TODOS_IMPORT_BATCH_SIZE", default=1000, cast=int)
+TODOS_IMPORT_MAX_REPORTED_ERRORS = 100
+
+
+# Image variants
+
+TODOS_IMAGE_VARIANTS_ASYNC = config(
+    "TODOS_IMAGE_VARIANTS_ASYNC", default=True, cast=bool
+)
+TODOS_IMAGE_WORKERS = config("TODOS_IMAGE_WORKERS", default=2, cast=int)
+TODOS_IMAGE_VARIANT_QUALITY = config(
+    "TODOS_IMAGE_VARIANT_QUALITY", default=80, cast=int
+)
+
+
+# Resumable attachment uploads
+
+TODOS_UPLOAD_TEMP_DIR = config(
+    "TODOS_UPLOAD_TEMP_DIR", default=os.path.join(BASE_DIR, "upload_parts")
+)
+TODOS_UPLOAD_MAX_SIZE = config("TODOS_UPLOAD_MAX_SIZE", default=5 * 1024**3, cast=int)
+TODOS_UPLOAD_MAX_CHUNK_SIZE = config(
+    "TODOS_UPLOAD_MAX_CHUNK_SIZE", default=8 * 1024**2, cast=int
+)
+
+
+# Media delivery. TODOS_MEDIA_OFFLOAD is "", "x-accel-redirect" (nginx, with
+# an internal location at TODOS_MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT) or
+# "x-sendfile" (Apache mod_xsendfile, lighttpd). Without offload every byte
+# passes through Python, holding a worker for the whole transfer under WSGI;
+# set it in production.
+
+TODOS_MEDIA_OFFLOAD = config("TODOS_MEDIA_OFFLOAD", default="")
+TODOS_MEDIA_ACCEL_PREFIX = config(
+    "TODOS_MEDIA_ACCEL_PREFIX", default="/protected-media/"
+)
+
+
+# JSON API batching
+
+TODOS_API_MAX_BATCH = config("TODOS_API_MAX_BATCH", default=1000, cast=int)
+TODOS_API_BULK_BATCH_SIZE = config("TODOS_API_BULK_BATCH_SIZE", default=500, cast=int)
+
+# Delta sync (api/todos/sync): log entries per page, and days the change log
+# is kept (manage.py prunechanges). Clients that last synced longer ago
+# start over with a snapshot.
+TODOS_SYNC_PAGE_SIZE = config("TODOS_SYNC_PAGE_SIZE", default=500, cast=int)
+TODOS_SYNC_RETENTION = timedelta(
+    days=config("TODOS_SYNC_RETENTION", default=30, cast=int)
+)
+
+# Live to-do events (api/todos/events, ASGI only). The default broker only
+# reaches streams of the same process; with several workers use
+# "todos.broker.PostgresBroker" (LISTEN/NOTIFY on TODOS_EVENTS_CHANNEL).
+# Idle streams get a comment every TODOS_EVENTS_HEARTBEAT seconds, clients
+# that accept nothing for TODOS_EVENTS_SEND_TIMEOUT seconds are dropped, and
+# streams are recycled after about TODOS_EVENTS_MAX_AGE seconds. Browsers
+# reconnect after about TODOS_EVENTS_RETRY seconds.
+TODOS_EVENTS_BROKER = config("TODOS_EVENTS_BROKER", default="todos.broker.LocalBroker")
+TODOS_EVENTS_CHANNEL = config("TODOS_EVENTS_CHANNEL", default="todos_changes")
+TODOS_EVENTS_HEARTBEAT = config("TODOS_EVENTS_HEARTBEAT", default=15, cast=float)
+TODOS_EVENTS_SEND_TIMEOUT = config("TODOS_EVENTS_SEND_TIMEOUT", default=30, cast=float)
+TODOS_EVENTS_MAX_AGE = config("TODOS_EVENTS_MAX_AGE", default=3600, cast=float)
+TODOS_EVENTS_RETRY = config("TODOS_EVENTS_RETRY", default=3, cast=float)
+TODOS_EVENTS_MAX_PER_USER = config("TODOS_EVENTS_MAX_PER_USER", default=10, cast=int)
+
+# Due-date reminders (manage.py runreminders). Reminders fire
+# TODOS_REMINDER_LEAD minutes before the due date; the worker preloads the
+# next TODOS_REMINDER_HORIZON minutes and skips reminders more than
+# TODOS_REMINDER_MAX_LATENESS minutes late (e.g. after long downtime).
+TODOS_REMINDER_SINK = config("TODOS_REMINDER_SINK", default="todos.reminders.LogSink")
+TODOS_REMINDER_WEBHOOK_URL = config("TODOS_REMINDER_WEBHOOK_URL", default="")
+TODOS_REMINDER_LEAD = timedelta(
+    minutes=config("TODOS_REMINDER_LEAD", default=30, cast=int)
+)
+TODOS_REMINDER_HORIZON = timedelta(
+    minutes=config("TODOS_REMINDER_HORIZON", default=5, cast=int)
+)
+TODOS_REMINDER_MAX_LATENESS = timedelta(
+    minutes=config("TODOS_REMINDER_MAX_LATENESS", default=60, cast=int)
+)
+TODOS_REMINDER_BATCH_SIZE = config("TODOS_REMINDER_BATCH_SIZE", default=1000, cast=int)
+
+# Archival (manage.py archivetodos): completed to-dos due more than
+# TODOS_ARCHIVE_DONE_AFTER days ago and open ones due more than
+# TODOS_ARCHIVE_STALE_AFTER days ago move to the archive table.
+TODOS_ARCHIVE_DONE_AFTER = timedelta(
+    days=config("TODOS_ARCHIVE_DONE_AFTER", default=30, cast=int)
+)
+TODOS_ARCHIVE_STALE_AFTER = timedelta(
+    days=config("TODOS_ARCHIVE_STALE_AFTER", default=365, cast=int)
+)
+TODOS_ARCHIVE_BATCH_SIZE = config("TODOS_ARCHIVE_BATCH_SIZE", default=500, cast=int)
+TODOS_ARCHIVE_PAUSE = config("TODOS_ARCHIVE_PAUSE", default=0.5, cast=float)
@@ -0,0 +1,27 @@
+"""
+Settings for the test suite: local SQLite databases with one read replica
+and one shard, so routing is tested without a PostgreSQL server.
+
+    python manage.py test --settings=TodoList2.test_settings
+
+Environment variables still win, e.g. DB_ENGINE to test on PostgreSQL.
+"""
+
+import os
+
+os.environ.setdefault("DB_ENGINE", "django.db.backends.sqlite3")
+os.environ.setdefault("DB_NAME", "db.sqlite3")
+os.environ.setdefault("DB_PASSWORD", "")
+os.environ.setdefault("DB_HOST", "")
+os.environ.setdefault("DB_REPLICAS", "replica.sqlite3")
+os.environ.setdefault("DB_SHARDS", "shard1.sqlite3")
+# Sharding refuses the per-process locmem cache (see settings)...
+os.environ.setdefault("CACHE_BACKEND", "file")
+
+from .settings import *  # noqa: E402, F401, F403
+
+# ...but the tests run in a single process, where locmem is shared by all.
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# Hashing cost is not what the tests measure.
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
@@ -18,14 +18,16 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from todos.views import serveMedia
 
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("todos/", include("todos.urls")),
+    path(
+        f"{settings.MEDIA_URL.lstrip('/')}<path:path>",
+        serveMedia,
+        name="serveMedia",
+    ),
 ]
-
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,424 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import router, transaction
+from django.forms.models import model_to_dict
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import (
+    require_GET,
+    require_http_methods,
+    require_POST,
+)
+
+from .cache import bumpUserVersion, cacheStats
+from .counters import refreshCounters
+from .db import poolStats
+from .decorators import api_login_required, conditional_view
+from .etags import listValidators, todoValidators
+from .forms import ToDoAPIForm, TodoFilterForm
+from .hashers import hashingStats
+from .middleware import getRegistry
+from .models import ChunkedUpload, ToDoModel
+from .pagination import DEFAULT_SORT, InvalidCursor, akeysetPage
+from .sync import ResyncRequired, logChanges, syncPage
+from .uploads import (
+    UploadError,
+    discardUpload,
+    finalizeUpload,
+    parseContentRange,
+    startUpload,
+    writeChunk,
+)
+
+API_FIELDS = ToDoAPIForm.Meta.fields
+
+
+def serializeTodo(todo):
+    data = {"id": todo.pk}
+    data.update({field: getattr(todo, field) for field in API_FIELDS})
+    data["updated_at"] = todo.updated_at
+    return data
+
+
+def parseBody(request):
+    try:
+        body = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None, JsonResponse({"error": "Request body must be JSON."}, status=400)
+    if not isinstance(body, dict):
+        return None, JsonResponse(
+            {"error": "Request body must be an object."}, status=400
+        )
+    return body, None
+
+
+@require_GET
+@api_login_required
+@conditional_view(listValidators)
+async def listTodos(request):
+    filterForm = TodoFilterForm(request.GET)
+    if not filterForm.is_valid():
+        return JsonResponse({"errors": filterForm.errors}, status=400)
+    todos = filterForm.filter(ToDoModel.objects.filter(user=request.user))
+    try:
+        todos, nextCursor = await akeysetPage(
+            todos,
+            sort=filterForm.cleaned_data.get("sort") or DEFAULT_SORT,
+            cursor=filterForm.cleaned_data.get("cursor"),
+            pageSize=settings.TODOS_PAGE_SIZE,
+        )
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(
+        {"results": [serializeTodo(todo) for todo in todos], "next": nextCursor}
+    )
+
+
+@require_GET
+@api_login_required
+@conditional_view(todoValidators)
+async def getTodo(request, pk):
+    try:
+        todo = await ToDoModel.objects.aget(id=pk, user=request.user)
+    except ToDoModel.DoesNotExist:
+        return JsonResponse({"error": "To-do not found."}, status=404)
+    return JsonResponse(serializeTodo(todo))
+
+
+@require_POST
+@api_login_required
+async def batchTodos(request):
+    """
+    Apply a batch of operations in one transaction:
+
+        {"create": [{...}], "update": [{"id": 1, ...}], "delete": [2, 3]}
+
+    Each list is optional. Creates and updates are validated with
+    ``ToDoAPIForm`` and written with ``bulk_create``/``bulk_update``; deletes
+    are a single filtered DELETE. Invalid items are reported and skipped, the
+    rest are applied. The response mirrors the request with one result per
+    item, in order.
+    """
+    body, error = parseBody(request)
+    if error:
+        return error
+
+    creates = body.get("create") or []
+    updates = body.get("update") or []
+    deletes = body.get("delete") or []
+    if not all(isinstance(ops, list) for ops in (creates, updates, deletes)):
+        return JsonResponse(
+            {"error": "'create', 'update' and 'delete' must be lists."}, status=400
+        )
+    if len(creates) + len(updates) + len(deletes) > settings.TODOS_API_MAX_BATCH:
+        return JsonResponse(
+            {"error": f"At most {settings.TODOS_API_MAX_BATCH} operations per batch."},
+            status=400,
+        )
+
+    return JsonResponse(
+        await sync_to_async(applyBatch)(request.user, creates, updates, deletes)
+    )
+
+
+def applyBatch(user, creates, updates, deletes):
+    createResults, newTodos = validateCreates(user, creates)
+    updateResults, changedTodos = validateUpdates(user, updates)
+    deleteIds, deleteResults = validateDeletes(deletes)
+
+    using = router.db_for_write(ToDoModel, userId=user.pk)
+    with transaction.atomic(using=using):
+        if newTodos:
+            ToDoModel.objects.bulk_create(
+                newTodos, batch_size=settings.TODOS_API_BULK_BATCH_SIZE
+            )
+        if changedTodos:
+            # bulk_update skips auto_now, so stamp updated_at explicitly.
+            now = timezone.now()
+            for todo in changedTodos:
+                todo.updated_at = now
+            ToDoModel.objects.bulk_update(
+                changedTodos,
+                API_FIELDS + ["updated_at"],
+                batch_size=settings.TODOS_API_BULK_BATCH_SIZE,
+            )
+        if newTodos or changedTodos:
+            written = [todo.pk for todo in newTodos + changedTodos]
+            ToDoModel.objects.filter(pk__in=written).updateSearchVector()
+            logChanges(user.pk, written, using=using)
+        deleted = set()
+        if deleteIds:
+            todos = ToDoModel.objects.filter(user=user, id__in=deleteIds)
+            deleted = set(todos.values_list("id", flat=True))
+            todos.delete()
+
+    if newTodos or changedTodos:
+        # bulk_create/bulk_update bypass post_save, so invalidate here.
+        refreshCounters(user.pk)
+        bumpUserVersion(user.pk)
+
+    for result in createResults:
+        if "todo" in result:
+            result["todo"] = serializeTodo(result["todo"])
+    for result in updateResults:
+        if "todo" in result:
+            result["todo"] = serializeTodo(result["todo"])
+    for result in deleteResults:
+        if result["ok"] and result["id"] not in deleted:
+            result.update(ok=False, errors={"id": ["To-do not found."]})
+
+    return {"create": createResults, "update": updateResults, "delete": deleteResults}
+
+
+def validateCreates(user, items):
+    results, todos = [], []
+    for item in items:
+        if not isinstance(item, dict):
+            results.append(
+                {"ok": False, "errors": {"__all__": ["Expected an object."]}}
+            )
+            continue
+        form = ToDoAPIForm(item)
+        if not form.is_valid():
+            results.append({"ok": False, "errors": form.errors})
+            continue
+        todo = form.save(commit=False)
+        todo.user = user
+        todos.append(todo)
+        results.append({"ok": True, "todo": todo})
+    return results, todos
+
+
+def validateUpdates(user, items):
+    ids = [
+        item.get("id")
+        for item in items
+        if isinstance(item, dict) and isinstance(item.get("id"), int)
+    ]
+    existing = {
+        todo.pk: todo for todo in ToDoModel.objects.filter(user=user, id__in=ids)
+    }
+    results, todos, seen = [], [], set()
+    for item in items:
+        if not isinstance(item, dict):
+            results.append(
+                {"ok": False, "errors": {"__all__": ["Expected an object."]}}
+            )
+            continue
+        todo = existing.get(item.get("id"))
+        if todo is None:
+            results.append(
+                {
+                    "ok": False,
+                    "id": item.get("id"),
+                    "errors": {"id": ["To-do not found."]},
+                }
+            )
+            continue
+        if todo.pk in seen:
+            results.append(
+                {
+                    "ok": False,
+                    "id": todo.pk,
+                    "errors": {"id": ["Duplicate id in batch."]},
+                }
+            )
+            continue
+        data = model_to_dict(todo, fields=API_FIELDS)
+        data.update({k: v for k, v in item.items() if k in API_FIELDS})
+        form = ToDoAPIForm(data, instance=todo)
+        if not form.is_valid():
+            results.append({"ok": False, "id": todo.pk, "errors": form.errors})
+            continue
+        seen.add(todo.pk)
+        todos.append(form.save(commit=False))
+        results.append({"ok": True, "todo": todo})
+    return results, todos
+
+
+def validateDeletes(items):
+    ids, results = [], []
+    for item in items:
+        if isinstance(item, int) and not isinstance(item, bool):
+            ids.append(item)
+            results.append({"ok": True, "id": item})
+        else:
+            results.append(
+                {"ok": False, "id": item, "errors": {"id": ["Expected an integer id."]}}
+            )
+    return ids, results
+
+
+@require_GET
+@api_login_required
+async def syncTodos(request):
+    """
+    Changes to the user's to-dos since ``?cursor=``, in pages of at most
+    ``TODOS_SYNC_PAGE_SIZE`` log entries:
+
+        {"changes": [{"id": 1, "title": ...}, {"id": 2, "deleted": true}],
+         "cursor": "...", "more": false}
+
+    Without a cursor the first pages are a snapshot of every to-do. Keep
+    requesting with the returned cursor while ``more`` is true, and store
+    the last cursor for the next sync. A 410 means the cursor is older than
+    the retained log and the client has to start over without one.
+    """
+    try:
+        changes, cursor, more = await sync_to_async(syncPage)(
+            request.user.pk,
+            request.GET.get("cursor") or None,
+            settings.TODOS_SYNC_PAGE_SIZE,
+        )
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except ResyncRequired as e:
+        return JsonResponse({"error": str(e)}, status=410)
+    return JsonResponse(
+        {
+            "changes": [
+                {"id": todoId, "deleted": True} if todo is None else serializeTodo(todo)
+                for todoId, todo in changes
+            ],
+            "cursor": cursor,
+            "more": more,
+        }
+    )
+
+
+def todoEvents(request):
+    # The stream is served by todos.events.EventStreamApp, which
+    # TodoList2/asgi.py puts in front of Django; requests only get here
+    # through other entry points (WSGI, the test client).
+    return JsonResponse(
+        {"error": "The event stream is only served over ASGI (TodoList2.asgi)."},
+        status=501,
+    )
+
+
+@require_GET
+@api_login_required
+async def cacheStatistics(request):
+    if not request.user.is_admin:
+        return JsonResponse({"error": "Staff only."}, status=403)
+    return JsonResponse(await sync_to_async(cacheStats)())
+
+
+@require_GET
+@api_login_required
+def dbStatistics(request):
+    if not request.user.is_admin:
+        return JsonResponse({"error": "Staff only."}, status=403)
+    return JsonResponse(poolStats())
+
+
+@require_GET
+@api_login_required
+def timingStatistics(request):
+    if not request.user.is_admin:
+        return JsonResponse({"error": "Staff only."}, status=403)
+    return JsonResponse(getRegistry().summary())
+
+
+@require_GET
+@api_login_required
+def authStatistics(request):
+    if not request.user.is_admin:
+        return JsonResponse({"error": "Staff only."}, status=403)
+    return JsonResponse(hashingStats())
+
+
+def serializeUpload(upload):
+    return {
+        "id": upload.pk,
+        "todo": upload.todo_id,
+        "filename": upload.filename,
+        "size": upload.size,
+        "offset": upload.offset,
+        "chunk_size": settings.TODOS_UPLOAD_MAX_CHUNK_SIZE,
+        "completed": upload.completed_at is not None,
+    }
+
+
+@require_POST
+@api_login_required
+def createUpload(request):
+    """
+    Start a resumable upload for a to-do's attachment:
+
+        {"todo": 1, "filename": "report.pdf", "size": 104857600}
+
+    The client then PUTs chunks to the returned upload with a
+    ``Content-Range: bytes <start>-<end>/<size>`` header, GETs the upload to
+    find the offset to resume from, and POSTs to ``finalize`` when done.
+    """
+    body, error = parseBody(request)
+    if error:
+        return error
+    todoId, filename, size = body.get("todo"), body.get("filename"), body.get("size")
+    if not isinstance(filename, str) or not filename.strip():
+        return JsonResponse({"error": "'filename' is required."}, status=400)
+    if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+        return JsonResponse({"error": "'size' must be a byte count."}, status=400)
+    try:
+        todo = ToDoModel.objects.get(id=todoId, user=request.user)
+    except (ToDoModel.DoesNotExist, ValueError, TypeError):
+        return JsonResponse({"error": "To-do not found."}, status=404)
+    try:
+        upload = startUpload(request.user, todo, filename, size)
+    except UploadError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+    return JsonResponse(serializeUpload(upload), status=201)
+
+
+@require_http_methods(["GET", "PUT", "DELETE"])
+@api_login_required
+def uploadDetail(request, pk):
+    try:
+        upload = ChunkedUpload.objects.get(id=pk, user=request.user)
+    except ChunkedUpload.DoesNotExist:
+        return JsonResponse({"error": "Upload not found."}, status=404)
+
+    if request.method == "DELETE":
+        discardUpload(upload)
+        return HttpResponse(status=204)
+
+    if request.method == "PUT":
+        try:
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+            start = upload.offset
+            if "HTTP_CONTENT_RANGE" in request.META:
+                start, length, total = parseContentRange(
+                    request.META["HTTP_CONTENT_RANGE"]
+                )
+                if total != upload.size:
+                    raise UploadError("Content-Range total does not match size.")
+            writeChunk(upload, start, length, request)
+        except UploadError as e:
+            data = serializeUpload(upload)
+            data["error"] = str(e)
+            return JsonResponse(data, status=e.status)
+
+    return JsonResponse(serializeUpload(upload))
+
+
+@require_POST
+@api_login_required
+def finalizeUploadView(request, pk):
+    try:
+        upload = ChunkedUpload.objects.select_related("todo").get(
+            id=pk, user=request.user
+        )
+    except ChunkedUpload.DoesNotExist:
+        return JsonResponse({"error": "Upload not found."}, status=404)
+    try:
+        todo = finalizeUpload(upload)
+    except UploadError as e:
+        data = serializeUpload(upload)
+        data["error"] = str(e)
+        return JsonResponse(data, status=e.status)
+    data = serializeTodo(todo)
+    data["file"] = todo.file.url
+    return JsonResponse(data)
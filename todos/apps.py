@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class TodosConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "todos"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .sharding import reserveIdRange
+
+        post_migrate.connect(reserveIdRange, sender=self)
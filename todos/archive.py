@@ -0,0 +1,88 @@
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedTodo, Status, ToDoModel
+from .sharding import shardAliases
+
+ARCHIVE_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "dueDate",
+    "priority",
+    "status",
+    "user_id",
+    "image",
+    "file",
+    "image_variants",
+)
+
+
+def archiveCandidates(doneAfter, staleAfter, now=None):
+    """
+    To-dos to move out of the live table, per shard: completed ones due
+    more than ``doneAfter`` ago and open ones due more than ``staleAfter``
+    ago. Each queryset is served by one of the partial ``(dueDate, id)``
+    indexes.
+    """
+    now = now or timezone.now()
+    candidates = []
+    for alias in shardAliases():
+        todos = ToDoModel.objects.using(alias)
+        candidates += [
+            todos.filter(status=Status.DONE, dueDate__lt=now - doneAfter),
+            todos.filter(status=Status.OPEN, dueDate__lt=now - staleAfter),
+        ]
+    return candidates
+
+
+def archiveBatch(queryset, batchSize):
+    """
+    Copy up to ``batchSize`` rows of ``queryset`` into ``ArchivedTodo`` and
+    delete them from ``ToDoModel`` in one transaction on the queryset's
+    database. The delete goes through the ORM so the cache version and
+    dashboard counters follow.
+    """
+    using = queryset.db
+    with transaction.atomic(using=using):
+        rows = list(
+            queryset.select_for_update(skip_locked=True)
+            .order_by("dueDate", "id")
+            .values(*ARCHIVE_FIELDS)[:batchSize]
+        )
+        if not rows:
+            return 0
+        archivedAt = timezone.now()
+        ArchivedTodo.objects.using(using).bulk_create(
+            [ArchivedTodo(archived_at=archivedAt, **row) for row in rows],
+            ignore_conflicts=True,
+        )
+        ToDoModel.objects.using(using).filter(
+            id__in=[row["id"] for row in rows]
+        ).delete()
+    return len(rows)
+
+
+def archiveTodos(
+    doneAfter, staleAfter, batchSize, pause=0.0, maxBatches=None, onBatch=None
+):
+    """
+    Archive everything that is due for it, ``batchSize`` rows at a time,
+    sleeping ``pause`` seconds between batches to keep the load on the
+    primary low. Returns the number of archived to-dos.
+    """
+    archived = batches = 0
+    for queryset in archiveCandidates(doneAfter, staleAfter):
+        while maxBatches is None or batches < maxBatches:
+            moved = archiveBatch(queryset, batchSize)
+            if not moved:
+                break
+            archived += moved
+            batches += 1
+            if onBatch:
+                onBatch(archived)
+            if pause:
+                time.sleep(pause)
+    return archived
@@ -0,0 +1,78 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+from .cache import agetAuthVersion, bumpAuthVersion, getAuthVersion
+
+# userId -> (expires, auth version, user)
+_users = {}
+_usersLock = threading.Lock()
+
+
+def cachedUser(userId, version):
+    entry = _users.get(userId)
+    if entry is None:
+        return None
+    expires, cachedVersion, user = entry
+    if expires < time.monotonic() or cachedVersion != version:
+        return None
+    # Each request gets its own instance; views may modify request.user.
+    return copy.copy(user)
+
+
+def storeUser(userId, version, user):
+    with _usersLock:
+        if len(_users) >= settings.TODOS_USER_CACHE_SIZE:
+            _users.clear()
+        _users[userId] = (
+            time.monotonic() + settings.TODOS_USER_CACHE_TTL,
+            version,
+            copy.copy(user),
+        )
+
+
+def invalidateUser(userId):
+    """
+    Drop a user from this process's cache and bump their auth version,
+    which the other processes check on their next lookup when the cache is
+    shared (``TODOS_CACHE_SHARED``).
+    """
+    with _usersLock:
+        _users.pop(userId, None)
+    bumpAuthVersion(userId)
+
+
+class CachedUserBackend(ModelBackend):
+    """
+    ``ModelBackend`` whose ``get_user`` serves the user from a short-lived
+    per-process cache. Each lookup compares a per-user version kept in the
+    cache (bumped on save, password change and logout), so staleness is
+    bounded by that check rather than by the TTL. The check only works
+    across processes if they share the cache; otherwise, as with locmem,
+    every lookup goes to the database.
+    """
+
+    def get_user(self, user_id):
+        if not settings.TODOS_CACHE_SHARED:
+            return super().get_user(user_id)
+        version = getAuthVersion(user_id)
+        user = cachedUser(user_id, version)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                storeUser(user_id, version, user)
+        return user
+
+    async def aget_user(self, user_id):
+        if not settings.TODOS_CACHE_SHARED:
+            return await super().aget_user(user_id)
+        version = await agetAuthVersion(user_id)
+        user = cachedUser(user_id, version)
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                storeUser(user_id, version, user)
+        return user
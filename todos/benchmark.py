@@ -0,0 +1,618 @@
+import asyncio
+import io
+import os
+import random
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection
+from django.template import engines
+from django.template.loader import get_template
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .broker import getBroker
+from .cache import bumpUserVersion
+from .events import EventStreamApp
+from .middleware import percentile
+from .models import Priority, Status, ToDoModel, User
+from .sync import encodeSyncCursor, syncState
+from .uploads import startUpload, writeChunk
+
+PASSWORD = "bench-password"
+WORDS = (
+    "report invoice meeting groceries dentist backup release review budget "
+    "garden laundry taxes flight migration deploy newsletter"
+).split()
+DUE_DATE_FORMAT = "%Y-%m-%d %H:%M"
+CHUNK = b"x" * 64 * 1024
+
+
+def seedData(users, todosPerUser, batchSize=1000, seed=0):
+    """
+    Create ``users`` accounts (sharing one pre-hashed password) with
+    ``todosPerUser`` to-dos each, using bulk inserts so large volumes seed
+    quickly. Returns the created users.
+    """
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+    accounts = User.objects.bulk_create(
+        [
+            User(username=f"bench{n}", email=f"bench{n}@example.com", password=password)
+            for n in range(users)
+        ],
+        batch_size=batchSize,
+    )
+    rows = (
+        todo for user in accounts for todo in generateTodos(user, todosPerUser, rng)
+    )
+    insertTodos(rows, batchSize)
+    return accounts
+
+
+def generateTodos(user, count, rng):
+    now = timezone.now()
+    for _ in range(count):
+        yield ToDoModel(
+            title=" ".join(rng.sample(WORDS, 2)),
+            description=" ".join(rng.sample(WORDS, 6)),
+            dueDate=now + timedelta(minutes=rng.randint(-60 * 24 * 30, 60 * 24 * 90)),
+            priority=rng.choice(Priority.values),
+            status=rng.choice(Status.values),
+            user=user,
+        )
+
+
+def insertTodos(rows, batchSize=1000):
+    rows = iter(rows)
+    while batch := list(islice(rows, batchSize)):
+        ToDoModel.objects.bulk_create(batch)
+    ToDoModel.objects.updateSearchVector()
+
+
+@dataclass
+class Scenario:
+    name: str
+    call: object
+    prepare: object = None
+    expect: tuple = (200,)
+
+
+def formTodo(title="bench"):
+    return {
+        "title": title,
+        "description": " ".join(WORDS[:5]),
+        "priority": str(Priority.MEDIUM),
+        "status": str(Status.OPEN),
+        "dueDate": (timezone.now() + timedelta(days=1)).strftime(DUE_DATE_FORMAT),
+    }
+
+
+def importFile(rows=50):
+    lines = ["title,description,priority,status,dueDate"]
+    due = (timezone.now() + timedelta(days=2)).isoformat()
+    lines += [f"imported {n},{WORDS[n % len(WORDS)]},high,0,{due}" for n in range(rows)]
+    return SimpleUploadedFile("bench.csv", "\n".join(lines).encode(), "text/csv")
+
+
+def batchBody(bench, i):
+    ids = bench.todoIds[i % len(bench.todoIds) :][:10] or bench.todoIds[:10]
+    return {
+        "create": [
+            {
+                "title": f"batch {i} {n}",
+                "description": "bench",
+                "dueDate": (timezone.now() + timedelta(days=3)).isoformat(),
+            }
+            for n in range(10)
+        ],
+        "update": [{"id": pk, "priority": "high"} for pk in ids],
+    }
+
+
+def newTodo(bench, i):
+    return ToDoModel.objects.create(
+        title=f"scratch {i}",
+        description="bench",
+        dueDate=timezone.now(),
+        user=bench.user,
+    ).pk
+
+
+def newUpload(bench, i, write=False):
+    todo = ToDoModel.objects.get(pk=bench.todoIds[0])
+    upload = startUpload(bench.user, todo, f"bench{i}.bin", len(CHUNK))
+    if write:
+        writeChunk(upload, 0, len(CHUNK), io.BytesIO(CHUNK))
+    return upload.pk
+
+
+def relogin(bench, i):
+    bench.scratch.force_login(bench.other)
+
+
+def anonymous(bench, i):
+    bench.anon.cookies.clear()
+
+
+def recentCursor(bench, i):
+    # A client that last synced ten changes ago.
+    revision = syncState(bench.user.pk)[0]
+    return encodeSyncCursor(max(revision - 10, 0))
+
+
+def todoAt(bench, i):
+    return bench.todoIds[i % len(bench.todoIds)]
+
+
+SCENARIOS = [
+    Scenario(
+        "loginUser:GET", lambda b, s, i: b.anon.get(reverse("loginUser")), anonymous
+    ),
+    Scenario(
+        "loginUser:POST",
+        lambda b, s, i: b.anon.post(
+            reverse("loginUser"), {"username": b.user.username, "password": PASSWORD}
+        ),
+        anonymous,
+        expect=(302,),
+    ),
+    Scenario(
+        "registerUser:POST",
+        lambda b, s, i: b.anon.post(
+            reverse("registerUser"),
+            {
+                "username": f"registered{i}-{b.run}",
+                "email": f"registered{i}-{b.run}@example.com",
+                "password1": PASSWORD,
+                "password2": PASSWORD,
+            },
+        ),
+        anonymous,
+        expect=(302,),
+    ),
+    Scenario(
+        "logoutUser",
+        lambda b, s, i: b.scratch.get(reverse("logoutUser")),
+        relogin,
+        expect=(302,),
+    ),
+    Scenario("createTodos:GET", lambda b, s, i: b.client.get(reverse("createTodos"))),
+    Scenario(
+        "createTodos:POST",
+        lambda b, s, i: b.client.post(reverse("createTodos"), formTodo(f"created {i}")),
+        expect=(302,),
+    ),
+    Scenario("viewAll", lambda b, s, i: b.client.get(reverse("viewAll"))),
+    Scenario(
+        "viewAll:uncached",
+        lambda b, s, i: b.client.get(reverse("viewAll")),
+        lambda b, i: bumpUserVersion(b.user.pk),
+    ),
+    Scenario(
+        "viewAll:filtered",
+        lambda b, s, i: b.client.get(
+            reverse("viewAll"), {"sort": "-priority", "status": Status.OPEN}
+        ),
+        lambda b, i: bumpUserVersion(b.user.pk),
+    ),
+    Scenario(
+        "viewOne", lambda b, s, i: b.client.get(reverse("viewOne", args=[s])), todoAt
+    ),
+    Scenario(
+        "searchTodos",
+        lambda b, s, i: b.client.get(
+            reverse("searchTodos"), {"q": WORDS[i % len(WORDS)]}
+        ),
+    ),
+    Scenario(
+        "exportTodos:csv",
+        lambda b, s, i: b.client.get(reverse("exportTodos"), {"format": "csv"}),
+    ),
+    Scenario(
+        "exportTodos:ndjson",
+        lambda b, s, i: b.client.get(reverse("exportTodos"), {"format": "ndjson"}),
+    ),
+    Scenario(
+        "importTodos:POST",
+        lambda b, s, i: b.client.post(
+            reverse("importTodos"), {"file": importFile(), "format": "csv"}
+        ),
+    ),
+    Scenario("viewArchive", lambda b, s, i: b.client.get(reverse("viewArchive"))),
+    Scenario(
+        "updateOne:GET",
+        lambda b, s, i: b.client.get(reverse("updateOne", args=[s])),
+        todoAt,
+    ),
+    Scenario(
+        "updateOne:POST",
+        lambda b, s, i: b.client.post(
+            reverse("updateOne", args=[s]), formTodo(f"updated {i}")
+        ),
+        todoAt,
+        expect=(302,),
+    ),
+    Scenario(
+        "deleteOne:GET",
+        lambda b, s, i: b.client.get(reverse("deleteOne", args=[s])),
+        todoAt,
+    ),
+    Scenario(
+        "deleteOne:POST",
+        lambda b, s, i: b.client.post(reverse("deleteOne", args=[s])),
+        newTodo,
+        expect=(302,),
+    ),
+    Scenario(
+        "resetPassword:POST",
+        lambda b, s, i: b.anon.post(
+            reverse("resetPassword"), {"email": b.other.email, "newPassword": PASSWORD}
+        ),
+        anonymous,
+        expect=(302,),
+    ),
+    Scenario(
+        "changePassword:POST",
+        lambda b, s, i: b.anon.post(
+            reverse("changePassword"),
+            {
+                "email": b.other.email,
+                "old_password": PASSWORD,
+                "new_password": PASSWORD,
+                "confirm_password": PASSWORD,
+            },
+        ),
+        anonymous,
+        expect=(302,),
+    ),
+    Scenario(
+        "viewUserDetail",
+        lambda b, s, i: b.client.get(reverse("viewUserDetail", args=[b.user.pk])),
+    ),
+    Scenario("apiListTodos", lambda b, s, i: b.client.get(reverse("apiListTodos"))),
+    Scenario(
+        "apiGetTodo",
+        lambda b, s, i: b.client.get(reverse("apiGetTodo", args=[s])),
+        todoAt,
+    ),
+    Scenario(
+        "apiBatchTodos",
+        lambda b, s, i: b.client.post(
+            reverse("apiBatchTodos"), batchBody(b, i), content_type="application/json"
+        ),
+    ),
+    Scenario(
+        "apiSyncTodos:snapshot",
+        lambda b, s, i: b.client.get(reverse("apiSyncTodos")),
+    ),
+    Scenario(
+        "apiSyncTodos:delta",
+        lambda b, s, i: b.client.get(reverse("apiSyncTodos"), {"cursor": s}),
+        recentCursor,
+    ),
+    Scenario("apiCacheStats", lambda b, s, i: b.client.get(reverse("apiCacheStats"))),
+    Scenario("apiDbStats", lambda b, s, i: b.client.get(reverse("apiDbStats"))),
+    Scenario("apiTimingStats", lambda b, s, i: b.client.get(reverse("apiTimingStats"))),
+    Scenario("apiAuthStats", lambda b, s, i: b.client.get(reverse("apiAuthStats"))),
+    Scenario(
+        "apiCreateUpload",
+        lambda b, s, i: b.client.post(
+            reverse("apiCreateUpload"),
+            {"todo": b.todoIds[0], "filename": f"bench{i}.bin", "size": len(CHUNK)},
+            content_type="application/json",
+        ),
+        expect=(201,),
+    ),
+    Scenario(
+        "apiUploadDetail:GET",
+        lambda b, s, i: b.client.get(reverse("apiUploadDetail", args=[s])),
+        newUpload,
+    ),
+    Scenario(
+        "apiUploadDetail:PUT",
+        lambda b, s, i: b.client.put(
+            reverse("apiUploadDetail", args=[s]),
+            CHUNK,
+            content_type="application/octet-stream",
+            headers={"content-range": f"bytes 0-{len(CHUNK) - 1}/{len(CHUNK)}"},
+        ),
+        newUpload,
+    ),
+    Scenario(
+        "apiFinalizeUpload",
+        lambda b, s, i: b.client.post(reverse("apiFinalizeUpload", args=[s])),
+        lambda b, i: newUpload(b, i, write=True),
+    ),
+    Scenario("serveMedia", lambda b, s, i: b.client.get(b.mediaUrl)),
+]
+
+
+@dataclass
+class RouteResult:
+    timings: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+    errors: int = 0
+
+    def summary(self):
+        if not self.timings:
+            return {"requests": 0, "errors": self.errors}
+        ordered = sorted(self.timings)
+        elapsed = sum(self.timings)
+        return {
+            "requests": len(self.timings),
+            "errors": self.errors,
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+            "mean_ms": round(statistics.fmean(self.timings) * 1000, 3),
+            "throughput_rps": (
+                round(len(self.timings) / elapsed, 1) if elapsed else None
+            ),
+            "queries_mean": round(statistics.fmean(self.queries), 2),
+            "queries_max": max(self.queries),
+        }
+
+
+class Benchmark:
+    """
+    Drive every to-do route through the test client against seeded data and
+    collect per-route latency percentiles, sequential throughput and query
+    counts. Run it against a throwaway database (see ``benchtodos``): several
+    scenarios create, update and delete rows.
+    """
+
+    def __init__(self, users, todosPerUser, batchSize=1000):
+        start = time.perf_counter()
+        accounts = seedData(users + 1, todosPerUser, batchSize)
+        self.seedSeconds = time.perf_counter() - start
+        self.user, self.other = accounts[0], accounts[-1]
+        User.objects.filter(pk=self.user.pk).update(is_admin=True)
+        self.todoIds = list(
+            ToDoModel.objects.filter(user=self.user)
+            .order_by("id")
+            .values_list("id", flat=True)[:1000]
+        )
+        if not self.todoIds:
+            self.todoIds = [newTodo(self, 0)]
+        # A to-do of its own, so finalized uploads never replace the file.
+        attached = ToDoModel.objects.get(pk=newTodo(self, "media"))
+        attached.file.save("bench.txt", ContentFile(CHUNK))
+        self.mediaUrl = attached.file.url
+        self.run = int(time.time())
+
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.scratch = Client()
+        self.anon = Client()
+
+    def measure(self, scenario, iterations, warmup=0):
+        result = RouteResult()
+        for i in range(-warmup, iterations):
+            state = scenario.prepare(self, i) if scenario.prepare else None
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = scenario.call(self, state, i)
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                elapsed = time.perf_counter() - start
+            if hasattr(response, "close"):
+                response.close()
+            if i < 0:
+                continue
+            result.timings.append(elapsed)
+            result.queries.append(len(captured))
+            if response.status_code not in scenario.expect:
+                result.errors += 1
+        return result
+
+    def runAll(self, iterations, warmup=0, routes=None, onRoute=None):
+        results = {}
+        for scenario in SCENARIOS:
+            if routes and scenario.name.split(":")[0] not in routes:
+                continue
+            results[scenario.name] = self.measure(
+                scenario, iterations, warmup
+            ).summary()
+            if onRoute:
+                onRoute(scenario.name, results[scenario.name])
+        return results
+
+
+# The list rows as they were rendered before the fast path: whole model
+# instances and three {% url %} lookups per row.
+LEGACY_ROWS = """<tbody>{% for data in dataset %}<tr>
+<td scope="row">{{data.title}}</td><td>{{data.get_priority_display}}</td>
+<td>{{data.get_status_display}}</td><td>{{data.dueDate}}</td>
+<td><a href="{% url 'deleteOne' data.pk %}">click!</a></td>
+<td><a href="{% url 'updateOne' data.pk %}">click!</a></td>
+<td><a href="{% url 'viewOne' data.pk %}">click!</a></td>
+</tr>{% endfor %}</tbody>"""
+
+
+def timed(fn, repeat):
+    """Median wall time of ``fn`` over ``repeat`` runs, and its last result."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def renderComparison(user, sizes, repeat=5):
+    """
+    Fetch and render ``size`` list rows both the legacy way and the way
+    ``viewAll`` does now, reporting fetch and render time separately.
+    """
+    from .views import LIST_FIELDS, listRows, urlPrefix
+
+    missing = max(sizes) - ToDoModel.objects.filter(user=user).count()
+    if missing > 0:
+        insertTodos(generateTodos(user, missing, random.Random(1)))
+
+    legacy = engines["django"].from_string(LEGACY_ROWS)
+    fast = get_template("todos/todoRows.html")
+    todos = ToDoModel.objects.filter(user=user).order_by("dueDate", "id")
+    results = {}
+    for size in sizes:
+        legacyFetch, instances = timed(lambda: list(todos[:size]), repeat)
+        legacyRender, _ = timed(lambda: legacy.render({"dataset": instances}), repeat)
+        fastFetch, rows = timed(
+            lambda: listRows(list(todos.values(*LIST_FIELDS)[:size])), repeat
+        )
+        fastRender, _ = timed(
+            lambda: fast.render(
+                {
+                    "dataset": rows,
+                    "rowUrls": {
+                        name: urlPrefix(name)
+                        for name in ("deleteOne", "updateOne", "viewOne")
+                    },
+                }
+            ),
+            repeat,
+        )
+        results[str(size)] = {
+            "rows": len(rows),
+            "legacy_fetch_ms": round(legacyFetch * 1000, 3),
+            "legacy_render_ms": round(legacyRender * 1000, 3),
+            "fast_fetch_ms": round(fastFetch * 1000, 3),
+            "fast_render_ms": round(fastRender * 1000, 3),
+            "render_speedup": (
+                round(legacyRender / fastRender, 2) if fastRender else None
+            ),
+        }
+    return results
+
+
+class StreamClient:
+    """The client side of one event stream, driven in-process over ASGI."""
+
+    def __init__(self, app, cookie):
+        self.opened = asyncio.Event()
+        self.received = asyncio.Event()
+        self.closed = asyncio.Event()
+        self.status = None
+        self.receivedAt = None
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": reverse("apiTodoEvents"),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        self.task = asyncio.create_task(app(scope, self.receive, self.send))
+
+    async def receive(self):
+        await self.closed.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif b"event: " in message.get("body", b""):
+            self.receivedAt = time.perf_counter()
+            self.received.set()
+        else:
+            self.opened.set()
+
+
+def residentBytes():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+async def measureStreams(app, cookie, user, count, idleSeconds):
+    residentBefore = residentBytes()
+    threadsBefore = threading.active_count()
+    start = time.perf_counter()
+    streams = [StreamClient(app, cookie) for _ in range(count)]
+    await asyncio.gather(*(stream.opened.wait() for stream in streams))
+    opened = time.perf_counter() - start
+    residentAfter = residentBytes()
+    threads = threading.active_count() - threadsBefore
+    failed = sum(stream.status != 200 for stream in streams)
+
+    cpuStart = time.process_time()
+    await asyncio.sleep(idleSeconds)
+    idleCpu = time.process_time() - cpuStart
+
+    published = time.perf_counter()
+    await ToDoModel.objects.acreate(
+        title="stream", description="bench", dueDate=timezone.now(), user=user
+    )
+    await asyncio.wait_for(
+        asyncio.gather(*(stream.received.wait() for stream in streams)), 60
+    )
+    delays = sorted(stream.receivedAt - published for stream in streams)
+
+    start = time.perf_counter()
+    for stream in streams:
+        stream.closed.set()
+    await asyncio.gather(*(stream.task for stream in streams))
+    closed = time.perf_counter() - start
+    return {
+        "streams": count,
+        "failed": failed,
+        "open_seconds": round(opened, 3),
+        "threads_added": threads,
+        "rss_bytes_per_stream": (
+            (residentAfter - residentBefore) // count
+            if residentBefore is not None and residentAfter is not None
+            else None
+        ),
+        "idle_cpu_percent": round(idleCpu / idleSeconds * 100, 2),
+        "fanout_p50_ms": round(percentile(delays, 0.50) * 1000, 3),
+        "fanout_p99_ms": round(percentile(delays, 0.99) * 1000, 3),
+        "fanout_max_ms": round(delays[-1] * 1000, 3),
+        "close_seconds": round(closed, 3),
+        "open_after_close": getBroker().stats()["streams"],
+    }
+
+
+def idleStreams(user, counts, idleSeconds=2.0, heartbeat=1.0):
+    """
+    Open ``count`` event streams for ``user`` on the ASGI app in this
+    process, leave them idle for ``idleSeconds`` with a ``heartbeat``
+    second heartbeat, then publish one change. Reports what one worker
+    pays to hold them (resident memory per stream, threads, CPU while
+    idle) and how long the change takes to reach every stream. Sockets and
+    kernel buffers are not part of the measurement; the file descriptor
+    limit (ulimit -n) caps real connections separately.
+    """
+    client = Client()
+    client.force_login(user)
+    name = settings.SESSION_COOKIE_NAME
+    cookie = f"{name}={client.cookies[name].value}"
+    app = EventStreamApp(ASGIHandler())
+    results = {}
+    with override_settings(
+        TODOS_EVENTS_MAX_PER_USER=0, TODOS_EVENTS_HEARTBEAT=heartbeat
+    ):
+        for count in counts:
+            results[str(count)] = asyncio.run(
+                measureStreams(app, cookie, user, count, idleSeconds)
+            )
+    return results
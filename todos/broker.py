@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    One open event stream. ``changed`` is set when the user's to-dos changed
+    since the stream last read the change log; setting it again before the
+    stream catches up does nothing, so a slow stream holds at most one
+    pending wake-up however many writes happen meanwhile.
+    """
+
+    def __init__(self, userId, loop):
+        self.userId = userId
+        self.loop = loop
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        # Called from writer threads; asyncio.Event is not thread-safe.
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.changed.set)
+
+
+class LocalBroker:
+    """
+    Fans change notifications out to the event streams of this process.
+    Enough for a single ASGI worker; with several, writes made by one
+    worker have to reach the streams of the others (see PostgresBroker).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+
+    def subscribe(self, userId):
+        """
+        Register a stream of the running event loop, or return ``None`` when
+        the user already has ``TODOS_EVENTS_MAX_PER_USER`` streams open.
+        """
+        limit = settings.TODOS_EVENTS_MAX_PER_USER
+        subscription = Subscription(userId, asyncio.get_running_loop())
+        with self.lock:
+            streams = self.subscriptions[userId]
+            if limit and len(streams) >= limit:
+                return None
+            streams.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            streams = self.subscriptions.get(subscription.userId)
+            if streams is not None:
+                streams.discard(subscription)
+                if not streams:
+                    del self.subscriptions[subscription.userId]
+
+    def publish(self, userId):
+        """Tell the user's streams to read the change log. Call after commit."""
+        self.deliver(userId)
+
+    def deliver(self, userId):
+        with self.lock:
+            streams = list(self.subscriptions.get(userId, ()))
+        for subscription in streams:
+            subscription.notify()
+
+    def deliverAll(self):
+        with self.lock:
+            streams = [s for group in self.subscriptions.values() for s in group]
+        for subscription in streams:
+            subscription.notify()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "users": len(self.subscriptions),
+                "streams": sum(map(len, self.subscriptions.values())),
+            }
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Shares notifications between workers with PostgreSQL LISTEN/NOTIFY on
+    the default database. ``publish`` sends a NOTIFY; every worker, the
+    publishing one included, delivers it to its own streams when it comes
+    back on the worker's listening connection. The listener runs as a task
+    on the event loop of the first stream and reconnects on errors, waking
+    every stream afterwards in case notifications were missed meanwhile.
+    Requires psycopg 3.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.listener = None
+
+    def subscribe(self, userId):
+        subscription = super().subscribe(userId)
+        if subscription is not None and (
+            self.listener is None
+            or self.listener.done()
+            or self.listener.get_loop() is not subscription.loop
+        ):
+            self.listener = subscription.loop.create_task(self.listen())
+        return subscription
+
+    def publish(self, userId):
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, %s)",
+                [settings.TODOS_EVENTS_CHANNEL, str(userId)],
+            )
+
+    def connectionParams(self):
+        settingsDict = connections[DEFAULT_DB_ALIAS].settings_dict
+        params = {
+            "dbname": settingsDict["NAME"],
+            "user": settingsDict["USER"],
+            "password": settingsDict["PASSWORD"],
+            "host": settingsDict["HOST"],
+            "port": settingsDict["PORT"],
+        }
+        return {name: value for name, value in params.items() if value}
+
+    async def listen(self):
+        import psycopg
+        from psycopg import sql
+
+        delay = 1
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    autocommit=True, **self.connectionParams()
+                ) as connection:
+                    await connection.execute(
+                        sql.SQL("LISTEN {}").format(
+                            sql.Identifier(settings.TODOS_EVENTS_CHANNEL)
+                        )
+                    )
+                    delay = 1
+                    self.deliverAll()
+                    async for notification in connection.notifies():
+                        try:
+                            self.deliver(int(notification.payload))
+                        except ValueError:
+                            logger.warning(
+                                "Ignored notification %r", notification.payload
+                            )
+            except psycopg.Error:
+                logger.exception("Event listener lost its connection, retrying.")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+
+broker = None
+brokerLock = threading.Lock()
+
+
+def getBroker():
+    global broker
+    with brokerLock:
+        if broker is None:
+            broker = import_string(settings.TODOS_EVENTS_BROKER)()
+        return broker
+
+
+def publishChange(userId):
+    try:
+        getBroker().publish(userId)
+    except Exception:
+        # Streams still catch up on their next wake-up or reconnect.
+        logger.exception("Could not publish a change of user %s", userId)
@@ -0,0 +1,195 @@
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+STATS_KEYS = ("todos:stats:hits", "todos:stats:misses")
+
+
+def getCache():
+    return caches[settings.TODOS_CACHE_ALIAS]
+
+
+def versionKey(userId):
+    return f"todos:version:{userId}"
+
+
+def getVersion(key):
+    cache = getCache()
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock rather than 1 so an evicted version can never
+        # collide with entries that are still cached under an older one.
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+async def agetVersion(key):
+    cache = getCache()
+    version = await cache.aget(key)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(key, version, timeout=None):
+            version = await cache.aget(key, version)
+    return version
+
+
+def bumpVersion(key):
+    cache = getCache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def getUserVersion(userId):
+    return getVersion(versionKey(userId))
+
+
+async def agetUserVersion(userId):
+    return await agetVersion(versionKey(userId))
+
+
+def bumpUserVersion(userId):
+    bumpVersion(versionKey(userId))
+
+
+def authVersionKey(userId):
+    return f"todos:auth:{userId}"
+
+
+def getAuthVersion(userId):
+    return getVersion(authVersionKey(userId))
+
+
+async def agetAuthVersion(userId):
+    return await agetVersion(authVersionKey(userId))
+
+
+def bumpAuthVersion(userId):
+    bumpVersion(authVersionKey(userId))
+
+
+def recordStat(hit):
+    cache = getCache()
+    key = STATS_KEYS[0] if hit else STATS_KEYS[1]
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+async def arecordStat(hit):
+    cache = getCache()
+    key = STATS_KEYS[0] if hit else STATS_KEYS[1]
+    await cache.aadd(key, 0, timeout=None)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, 1, timeout=None)
+
+
+def cacheStats():
+    values = getCache().get_many(STATS_KEYS)
+    hits = values.get(STATS_KEYS[0], 0)
+    misses = values.get(STATS_KEYS[1], 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / total if total else None,
+    }
+
+
+def pageKey(request, name, kwargs, version):
+    userId = request.user.pk
+    query = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    args = ":".join(f"{k}={v}" for k, v in sorted(kwargs.items()))
+    return f"todos:page:{userId}:{version}:{name}:{args}:{query}"
+
+
+def isCacheable(request):
+    return (
+        settings.TODOS_CACHE_SHARED
+        and request.method == "GET"
+        and request.user.is_authenticated
+    )
+
+
+def cachedResponse(cached):
+    content, contentType = cached
+    return HttpResponse(content, content_type=contentType)
+
+
+def cacheEntry(response):
+    if response.status_code == 200 and not response.streaming:
+        return (response.content, response["Content-Type"])
+    return None
+
+
+def cache_per_user(name):
+    """
+    Cache successful GET responses of a per-user view under a key that embeds
+    the user's data version. Writes bump the version (see ``todos.signals``),
+    so stale pages are never looked up again and simply age out of the cache.
+    Pages are only cached when ``TODOS_CACHE_SHARED`` says every process
+    sees those bumps.
+    Works on both sync and async views; async views must run after
+    ``async_login_required`` so ``request.user`` is already resolved.
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def asyncWrapper(request, *args, **kwargs):
+                if not isCacheable(request):
+                    return await view(request, *args, **kwargs)
+
+                cache = getCache()
+                version = await agetUserVersion(request.user.pk)
+                key = pageKey(request, name, kwargs, version)
+                cached = await cache.aget(key)
+                if cached is not None:
+                    await arecordStat(hit=True)
+                    return cachedResponse(cached)
+
+                await arecordStat(hit=False)
+                response = await view(request, *args, **kwargs)
+                entry = cacheEntry(response)
+                if entry:
+                    await cache.aset(key, entry, timeout=settings.TODOS_CACHE_TIMEOUT)
+                return response
+
+            return asyncWrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not isCacheable(request):
+                return view(request, *args, **kwargs)
+
+            cache = getCache()
+            key = pageKey(request, name, kwargs, getUserVersion(request.user.pk))
+            cached = cache.get(key)
+            if cached is not None:
+                recordStat(hit=True)
+                return cachedResponse(cached)
+
+            recordStat(hit=False)
+            response = view(request, *args, **kwargs)
+            entry = cacheEntry(response)
+            if entry:
+                cache.set(key, entry, timeout=settings.TODOS_CACHE_TIMEOUT)
+            return response
+
+        return wrapper
+
+    return decorator
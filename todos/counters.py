@@ -0,0 +1,147 @@
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Priority, Status, TodoCounters, ToDoModel
+
+PRIORITY_FIELDS = {
+    Priority.LOW: "priority_low",
+    Priority.MEDIUM: "priority_medium",
+    Priority.HIGH: "priority_high",
+}
+# What a to-do contributes to the counters, captured at load time so that
+# saves and deletes can apply a delta instead of recounting.
+STATE_FIELDS = ("user_id", "status", "priority", "dueDate")
+
+
+def userCounters(userId):
+    # The hint lets a sharding router find the user's database.
+    return TodoCounters.objects.db_manager(hints={"userId": userId})
+
+
+def userTodos(userId):
+    return ToDoModel.objects.db_manager(hints={"userId": userId})
+
+
+def dayBounds(day):
+    """Start of ``day``, of the next day and of the day a week later."""
+    return tuple(
+        timezone.make_aware(datetime.combine(day + timedelta(days=n), time.min))
+        for n in (0, 1, 7)
+    )
+
+
+def todoState(todo):
+    # Read __dict__ directly: deferred fields must not trigger a query.
+    values = todo.__dict__
+    if any(name not in values for name in STATE_FIELDS):
+        return None
+    dueDate = values["dueDate"]
+    # Unsaved values may still be strings or naive; treat them as unknown.
+    if not isinstance(dueDate, datetime) or timezone.is_naive(dueDate):
+        return None
+    return tuple(values[name] for name in STATE_FIELDS)
+
+
+def contribution(state, bounds):
+    _, status, priority, dueDate = state
+    counts = Counter()
+    if status != Status.OPEN:
+        return counts
+    today, tomorrow, weekEnd = bounds
+    counts["open"] = 1
+    if priority in PRIORITY_FIELDS:
+        counts[PRIORITY_FIELDS[priority]] = 1
+    if dueDate < today:
+        counts["overdue"] = 1
+    elif dueDate < tomorrow:
+        counts["due_today"] = 1
+    if today <= dueDate < weekEnd:
+        counts["due_week"] = 1
+    return counts
+
+
+def recordChange(old, new):
+    """
+    Apply the difference between two states of a to-do (``None`` when it did
+    not exist before or no longer exists) as ``F()`` increments. Rows whose
+    ``day`` is stale are left alone; they are recounted on the next read.
+    """
+    day = timezone.localdate()
+    bounds = dayBounds(day)
+    deltas = defaultdict(Counter)
+    if old is not None:
+        deltas[old[0]].subtract(contribution(old, bounds))
+    if new is not None:
+        deltas[new[0]].update(contribution(new, bounds))
+    for userId, delta in deltas.items():
+        changes = {name: F(name) + n for name, n in delta.items() if n}
+        if changes:
+            userCounters(userId).filter(user_id=userId, day=day).update(
+                updated_at=timezone.now(), **changes
+            )
+
+
+def invalidateCounters(userId):
+    userCounters(userId).filter(user_id=userId).delete()
+
+
+def countTodos(userId, day):
+    today, tomorrow, weekEnd = dayBounds(day)
+    # One pass over the user's open rows via todo_user_status_due_id_idx.
+    return (
+        userTodos(userId)
+        .filter(user_id=userId, status=Status.OPEN)
+        .aggregate(
+            open=Count("id"),
+            overdue=Count("id", filter=Q(dueDate__lt=today)),
+            due_today=Count("id", filter=Q(dueDate__gte=today, dueDate__lt=tomorrow)),
+            due_week=Count("id", filter=Q(dueDate__gte=today, dueDate__lt=weekEnd)),
+            **{
+                name: Count("id", filter=Q(priority=priority))
+                for priority, name in PRIORITY_FIELDS.items()
+            },
+        )
+    )
+
+
+def refreshCounters(userId, day=None):
+    """
+    Recount a user's counters from ``ToDoModel`` for ``day`` (today by
+    default). Returns the counters row and whether any value changed.
+    """
+    day = day or timezone.localdate()
+    counters = userCounters(userId)
+    using = router.db_for_write(TodoCounters, userId=userId)
+    with transaction.atomic(using=using):
+        row = counters.select_for_update().filter(user_id=userId).first()
+        counts = countTodos(userId, day)
+        if row is None:
+            try:
+                with transaction.atomic(using=using):
+                    row = counters.create(user_id=userId, day=day, **counts)
+                return row, True
+            except IntegrityError:
+                # Created concurrently; lock it and reconcile below.
+                row = counters.select_for_update().get(user_id=userId)
+        changed = row.day != day or any(
+            getattr(row, name) != value for name, value in counts.items()
+        )
+        if changed:
+            row.day = day
+            for name, value in counts.items():
+                setattr(row, name, value)
+            row.updated_at = timezone.now()
+            row.save()
+    return row, changed
+
+
+def getCounters(userId):
+    day = timezone.localdate()
+    row = userCounters(userId).filter(user_id=userId, day=day).first()
+    if row is None:
+        row, _ = refreshCounters(userId, day)
+    return row
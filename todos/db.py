@@ -0,0 +1,34 @@
+from django.db import connections
+
+
+def poolStats():
+    """
+    Connection statistics per database alias: psycopg pool counters when
+    pooling is enabled, otherwise the persistent-connection settings.
+    """
+    stats = {}
+    for connection in connections.all(initialized_only=True):
+        pool = getattr(connection, "pool", None)
+        if pool is None:
+            stats[connection.alias] = {
+                "pooled": False,
+                "conn_max_age": connection.settings_dict["CONN_MAX_AGE"],
+                "health_checks": connection.settings_dict["CONN_HEALTH_CHECKS"],
+            }
+            continue
+        raw = pool.get_stats()
+        stats[connection.alias] = {
+            "pooled": True,
+            "min_size": raw.get("pool_min"),
+            "max_size": raw.get("pool_max"),
+            "size": raw.get("pool_size"),
+            "available": raw.get("pool_available"),
+            "in_use": raw.get("pool_size", 0) - raw.get("pool_available", 0),
+            "waiting": raw.get("requests_waiting", 0),
+            "created": raw.get("connections_num", 0),
+            "requests": raw.get("requests_num", 0),
+            "queued": raw.get("requests_queued", 0),
+            "wait_ms": raw.get("requests_wait_ms", 0),
+            "timeouts": raw.get("requests_errors", 0),
+        }
+    return stats
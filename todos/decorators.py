@@ -0,0 +1,146 @@
+import math
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .hashers import getHashingRegistry, measureHashing
+from .throttle import throttleWait
+
+
+def async_login_required(view):
+    """
+    ``login_required`` for async views. Resolves the user with
+    ``request.auser()`` and stores it on ``request.user`` so templates and
+    context processors never trigger a synchronous lookup in the event loop.
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        request.user = user
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def api_login_required(view):
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def asyncWrapper(request, *args, **kwargs):
+            user = await request.auser()
+            if not user.is_authenticated:
+                return JsonResponse({"error": "Authentication required."}, status=401)
+            request.user = user
+            return await view(request, *args, **kwargs)
+
+        return asyncWrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentication required."}, status=401)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def notModified(request, etag, lastModified):
+    if request.method not in ("GET", "HEAD") or (etag is None and lastModified is None):
+        return None
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(lastModified.timestamp()) if lastModified else None,
+    )
+    return withValidators(response, etag, lastModified) if response else None
+
+
+def withValidators(response, etag, lastModified):
+    if response.status_code in (200, 304):
+        if etag and not response.has_header("ETag"):
+            response["ETag"] = etag
+        if lastModified and not response.has_header("Last-Modified"):
+            response["Last-Modified"] = http_date(lastModified.timestamp())
+        # Let browsers keep the page but revalidate it on every use.
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_view(validators):
+    """
+    Answer ``If-None-Match``/``If-Modified-Since`` with 304 before the view
+    runs. ``validators(request, *args, **kwargs)`` is a cheap synchronous
+    lookup returning ``(etag, lastModified)`` (either may be ``None``); for
+    async views it runs in a worker thread. Must run after the login
+    decorator so ``request.user`` is resolved.
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def asyncWrapper(request, *args, **kwargs):
+                etag, lastModified = await sync_to_async(validators)(
+                    request, *args, **kwargs
+                )
+                response = notModified(request, etag, lastModified)
+                if response is not None:
+                    return response
+                response = await view(request, *args, **kwargs)
+                return withValidators(response, etag, lastModified)
+
+            return asyncWrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag, lastModified = validators(request, *args, **kwargs)
+            response = notModified(request, etag, lastModified)
+            if response is not None:
+                return response
+            return withValidators(view(request, *args, **kwargs), etag, lastModified)
+
+        return wrapper
+
+    return decorator
+
+
+def throttle_hashing(name, accountField):
+    """
+    Guard a view that hashes passwords on POST: each attempt costs a token
+    from the client's IP bucket and from the bucket of the account named by
+    ``request.POST[accountField]``. An empty bucket answers 429 before any
+    hashing happens; allowed requests record their hashing time under
+    ``name`` (see ``/todos/api/auth_stats``).
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "POST":
+                return view(request, *args, **kwargs)
+            wait = throttleWait(name, request, request.POST.get(accountField, ""))
+            if wait:
+                getHashingRegistry().throttled(name)
+                retryAfter = math.ceil(wait)
+                response = render(
+                    request,
+                    "todos/throttled.html",
+                    {"retryAfter": retryAfter},
+                    status=429,
+                )
+                response["Retry-After"] = str(retryAfter)
+                return response
+            with measureHashing(name):
+                return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,47 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import ToDoModel
+
+
+def weakEtag(*parts):
+    digest = hashlib.md5(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def todoValidators(request, pk):
+    """ETag and Last-Modified of one to-do, from a primary key lookup."""
+    updated = (
+        ToDoModel.objects.filter(id=pk, user=request.user)
+        .values_list("updated_at", flat=True)
+        .first()
+    )
+    if updated is None:
+        return None, None
+    etag = weakEtag(request.user.pk, request.user.username, request.path, updated)
+    return etag, updated
+
+
+def listValidators(request):
+    """
+    ETag of a list page, from an index-only ``Max``/``Count`` over
+    ``todo_user_updated_idx``. The count catches deletes, which leave the
+    latest ``updated_at`` unchanged; for the same reason, and because the
+    dashboard buckets roll over daily, list pages carry no Last-Modified.
+    """
+    stats = ToDoModel.objects.filter(user=request.user).aggregate(
+        count=Count("id"), last=Max("updated_at")
+    )
+    return (
+        weakEtag(
+            request.user.pk,
+            request.user.username,
+            stats["count"],
+            stats["last"],
+            timezone.localdate(),
+            request.get_full_path(),
+        ),
+        None,
+    )
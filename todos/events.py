@@ -0,0 +1,222 @@
+import asyncio
+import io
+import json
+import logging
+import random
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.urls import reverse
+
+from .api import serializeTodo
+from .broker import getBroker
+from .pagination import InvalidCursor
+from .sync import (
+    ResyncRequired,
+    decodeSyncCursor,
+    encodeSyncCursor,
+    syncPage,
+    syncState,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class EventStreamApp:
+    """
+    ASGI app serving the to-do event stream (``apiTodoEvents``) in front of
+    Django's handler, which gets every other request. Django runs each
+    request's sync middleware in a thread of its own that lives as long as
+    the response, one idle thread per open stream; here the session is
+    read on a shared thread and an idle stream is only a suspended task.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.path = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            if self.path is None:
+                self.path = reverse("apiTodoEvents")
+            path = scope["path"]
+            root = scope.get("root_path", "")
+            if root and path.startswith(root):
+                path = path[len(root) :]
+            if path == self.path:
+                return await streamEvents(scope, receive, send)
+        return await self.app(scope, receive, send)
+
+
+async def sendJson(send, status, data):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": json.dumps(data).encode()})
+
+
+def loadUser(request):
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    try:
+        return get_user(request)
+    finally:
+        close_old_connections()
+
+
+def clientCursor(request):
+    # Browsers resend the id of the last event they saw when reconnecting.
+    cursor = request.headers.get("Last-Event-ID") or request.GET.get("cursor")
+    if cursor:
+        decodeSyncCursor(cursor)
+    return cursor or None
+
+
+def currentCursor(userId):
+    close_old_connections()
+    return encodeSyncCursor(syncState(userId)[0])
+
+
+def readChanges(userId, cursor):
+    # Runs on the shared executor, outside any request; keep the thread's
+    # connection within CONN_MAX_AGE like a request would.
+    close_old_connections()
+    return syncPage(userId, cursor, settings.TODOS_SYNC_PAGE_SIZE)
+
+
+def formatEvents(changes, cursor):
+    """
+    SSE messages for one page of changes. Only the last carries the cursor
+    as its id: a client that drops mid-page replays the page, never skips.
+    """
+    messages = []
+    for index, (todoId, todo) in enumerate(changes):
+        if todo is None:
+            event, data = "delete", {"id": todoId}
+        else:
+            event, data = "todo", serializeTodo(todo)
+        lines = [f"event: {event}", f"data: {json.dumps(data, cls=DjangoJSONEncoder)}"]
+        if index == len(changes) - 1:
+            lines.insert(0, f"id: {cursor}")
+        messages.append("\n".join(lines) + "\n\n")
+    return "".join(messages)
+
+
+async def watchDisconnect(receive, subscription, disconnected):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+    disconnected.set()
+    subscription.changed.set()
+
+
+async def streamEvents(scope, receive, send):
+    """
+    Push the user's to-do changes as Server-Sent Events: ``todo`` with the
+    to-do's current state, ``delete`` with its id, and ``resync`` (then the
+    stream ends) when the client's position was pruned from the change log.
+
+    Each wake-up reads the change log from the stream's cursor in pages, so
+    bursts of writes collapse into one page per to-do. Writes wait for the
+    client to drain (the ASGI server applies flow control); a client that
+    accepts nothing for ``TODOS_EVENTS_SEND_TIMEOUT`` seconds is dropped and
+    resumes from its last event id when it reconnects. Comments keep idle
+    connections open through proxies, and streams end after about
+    ``TODOS_EVENTS_MAX_AGE`` seconds so reconnects re-check the session.
+    """
+    request = ASGIRequest(scope, io.BytesIO())
+    if request.method != "GET":
+        return await sendJson(send, 405, {"error": "Method not allowed."})
+    user = await sync_to_async(loadUser)(request)
+    if not user.is_authenticated:
+        return await sendJson(send, 401, {"error": "Authentication required."})
+    try:
+        cursor = clientCursor(request)
+    except InvalidCursor as e:
+        return await sendJson(send, 400, {"error": str(e)})
+
+    broker = getBroker()
+    subscription = broker.subscribe(user.pk)
+    if subscription is None:
+        return await sendJson(send, 429, {"error": "Too many open event streams."})
+    disconnected = asyncio.Event()
+    watcher = asyncio.create_task(watchDisconnect(receive, subscription, disconnected))
+    try:
+        # A client resuming from a cursor catches up right away. A new
+        # stream starts at the current revision, read after subscribing so
+        # that a change committed in between still wakes it.
+        pending = cursor is not None
+        if not pending:
+            cursor = await sync_to_async(currentCursor, thread_sensitive=False)(user.pk)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        if await pushEvents(send, user.pk, cursor, pending, subscription, disconnected):
+            await send({"type": "http.response.body", "body": b""})
+    except asyncio.TimeoutError:
+        logger.info("Dropped the event stream of a slow client (user %s).", user.pk)
+    except OSError:
+        # The client went away while we were writing.
+        pass
+    finally:
+        watcher.cancel()
+        broker.unsubscribe(subscription)
+
+
+async def pushEvents(send, userId, cursor, pending, subscription, disconnected):
+    """The stream's main loop; returns False once the client has gone."""
+    loop = asyncio.get_running_loop()
+    # Spread reconnects so a restart does not bring every client back at once.
+    deadline = loop.time() + settings.TODOS_EVENTS_MAX_AGE * random.uniform(0.9, 1.1)
+    retry = int(settings.TODOS_EVENTS_RETRY * 1000 * random.uniform(0.5, 1.5))
+
+    async def write(text):
+        await asyncio.wait_for(
+            send(
+                {"type": "http.response.body", "body": text.encode(), "more_body": True}
+            ),
+            settings.TODOS_EVENTS_SEND_TIMEOUT,
+        )
+
+    await write(f"retry: {retry}\n\n")
+    while not disconnected.is_set():
+        if pending:
+            # Clear first: a change committed during the read sets it again.
+            subscription.changed.clear()
+            try:
+                changes, cursor, pending = await sync_to_async(
+                    readChanges, thread_sensitive=False
+                )(userId, cursor)
+            except ResyncRequired:
+                await write("event: resync\ndata: {}\n\n")
+                return True
+            if changes:
+                await write(formatEvents(changes, cursor))
+            continue
+        timeout = min(settings.TODOS_EVENTS_HEARTBEAT, deadline - loop.time())
+        if timeout <= 0:
+            return True
+        try:
+            await asyncio.wait_for(subscription.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            await write(": ping\n\n")
+        pending = subscription.changed.is_set()
+    return False
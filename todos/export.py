@@ -0,0 +1,81 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+EXPORT_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "priority",
+    "status",
+    "dueDate",
+    "file",
+    "image",
+)
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class Echo:
+    # csv.writer only needs write(); hand each row straight back to the caller.
+    def write(self, value):
+        return value
+
+
+def exportValues(queryset):
+    return queryset.order_by("dueDate", "id").values(*EXPORT_FIELDS)
+
+
+def exportRows(queryset, chunkSize):
+    return exportValues(queryset).iterator(chunk_size=chunkSize)
+
+
+def aexportRows(queryset, chunkSize):
+    return exportValues(queryset).aiterator(chunk_size=chunkSize)
+
+
+def csvRow(row):
+    row["dueDate"] = row["dueDate"].isoformat()
+    return [row[field] for field in EXPORT_FIELDS]
+
+
+def csvStream(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(csvRow(row))
+
+
+def ndjsonStream(rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(row) + "\n"
+
+
+# Under ASGI, Django reads a sync iterator into a list before sending any
+# of it; the async streams send each chunk as it is fetched.
+async def acsvStream(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    async for row in rows:
+        yield writer.writerow(csvRow(row))
+
+
+async def andjsonStream(rows):
+    encoder = DjangoJSONEncoder()
+    async for row in rows:
+        yield encoder.encode(row) + "\n"
+
+
+STREAMS = {
+    "csv": csvStream,
+    "ndjson": ndjsonStream,
+}
+
+ASYNC_STREAMS = {
+    "csv": acsvStream,
+    "ndjson": andjsonStream,
+}
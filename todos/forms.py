@@ -1,5 +1,10 @@
 from django import forms
-from .models import ToDoModel, User
+from .models import Priority, Status, ToDoModel, User
+
+
+class PriorityChoiceField(forms.TypedChoiceField):
+    def clean(self, value):
+        return super().clean(Priority.normalize(value))
 
 
 class ToDoForm(forms.ModelForm):
@@ -10,6 +15,7 @@ class ToDoForm(forms.ModelForm):
             "title",
             "description",
             "priority",
+            "status",
             "dueDate",
             "file",
             "image",
@@ -28,10 +34,14 @@ class ToDoForm(forms.ModelForm):
                     "placeholder": "Enter description",
                 }
             ),
-            "priority": forms.TextInput(
+            "priority": forms.Select(
                 attrs={
-                    "class": "form-control",
-                    "placeholder": "Enter priority",
+                    "class": "form-select",
+                }
+            ),
+            "status": forms.Select(
+                attrs={
+                    "class": "form-select",
                 }
             ),
             "dueDate": forms.TextInput(
@@ -53,6 +63,32 @@ class ToDoForm(forms.ModelForm):
         }
 
 
+class ToDoAPIForm(forms.ModelForm):
+    priority = PriorityChoiceField(
+        choices=Priority.choices,
+        coerce=int,
+        required=False,
+        empty_value=Priority.MEDIUM,
+    )
+    status = forms.TypedChoiceField(
+        choices=Status.choices,
+        coerce=int,
+        required=False,
+        empty_value=Status.OPEN,
+    )
+
+    class Meta:
+        model = ToDoModel
+
+        fields = [
+            "title",
+            "description",
+            "priority",
+            "status",
+            "dueDate",
+        ]
+
+
 class UserLoginForm(forms.Form):
     username = forms.CharField(
         max_length=150,
@@ -159,3 +195,85 @@ class PasswordChangeForm(forms.Form):
 
         if new_password != confirm_password:
             raise forms.ValidationError("New passwords do not match")
+
+
+class TodoImportForm(forms.Form):
+    FORMAT_CHOICES = [("csv", "CSV"), ("ndjson", "NDJSON")]
+
+    file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={"class": "form-control"})
+    )
+    format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+
+
+class TodoSearchForm(forms.Form):
+    q = forms.CharField(
+        max_length=200,
+        required=True,
+        widget=forms.TextInput(
+            attrs={
+                "class": "form-control",
+                "placeholder": "Search to-dos",
+                "type": "search",
+            }
+        ),
+    )
+
+
+class TodoFilterForm(forms.Form):
+    SORT_CHOICES = [
+        ("dueDate", "Due date (earliest first)"),
+        ("-dueDate", "Due date (latest first)"),
+        ("-priority", "Priority (highest first)"),
+    ]
+
+    priority = PriorityChoiceField(
+        choices=[("", "Any priority")] + Priority.choices,
+        coerce=int,
+        required=False,
+        empty_value=None,
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    status = forms.TypedChoiceField(
+        choices=[("", "Any status")] + Status.choices,
+        coerce=int,
+        required=False,
+        empty_value=None,
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    due_after = forms.DateTimeField(
+        required=False,
+        widget=forms.DateTimeInput(
+            attrs={"class": "form-control", "type": "datetime-local"}
+        ),
+    )
+    due_before = forms.DateTimeField(
+        required=False,
+        widget=forms.DateTimeInput(
+            attrs={"class": "form-control", "type": "datetime-local"}
+        ),
+    )
+    sort = forms.ChoiceField(
+        choices=SORT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    cursor = forms.CharField(required=False, widget=forms.HiddenInput())
+
+    def filter(self, queryset):
+        priority = self.cleaned_data.get("priority")
+        status = self.cleaned_data.get("status")
+        due_after = self.cleaned_data.get("due_after")
+        due_before = self.cleaned_data.get("due_before")
+        if priority is not None:
+            queryset = queryset.filter(priority=priority)
+        if status is not None:
+            queryset = queryset.filter(status=status)
+        if due_after:
+            queryset = queryset.filter(dueDate__gte=due_after)
+        if due_before:
+            queryset = queryset.filter(dueDate__lt=due_before)
+        return queryset
@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from .middleware import percentile
+
+currentClock = ContextVar("todos_hash_clock", default=None)
+
+
+class HashClock:
+    def __init__(self):
+        self.seconds = 0.0
+        self.count = 0
+        self.running = False
+
+
+@contextmanager
+def timedHashing():
+    clock = currentClock.get()
+    # PBKDF2's verify() calls encode(); only the outermost call counts.
+    if clock is None or clock.running:
+        yield
+        return
+    clock.running = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        clock.seconds += time.perf_counter() - start
+        clock.count += 1
+        clock.running = False
+
+
+class TimedHasherMixin:
+    """Adds the time spent hashing to the clock of the surrounding view."""
+
+    def encode(self, *args, **kwargs):
+        with timedHashing():
+            return super().encode(*args, **kwargs)
+
+    def verify(self, *args, **kwargs):
+        with timedHashing():
+            return super().verify(*args, **kwargs)
+
+    def harden_runtime(self, *args, **kwargs):
+        with timedHashing():
+            return super().harden_runtime(*args, **kwargs)
+
+
+# Cost parameters are read from settings on use, so changing them only
+# needs a restart: must_update() then reports older hashes and
+# check_password() rehashes them on the next successful login.
+
+
+class PBKDF2PasswordHasher(TimedHasherMixin, hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.TODOS_PBKDF2_ITERATIONS or super().iterations
+
+
+class Argon2PasswordHasher(TimedHasherMixin, hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.TODOS_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.TODOS_ARGON2_MEMORY_COST
+
+
+class ScryptPasswordHasher(TimedHasherMixin, hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return settings.TODOS_SCRYPT_WORK_FACTOR
+
+
+class HashingRegistry:
+    """Rolling per-view hashing time and throttle counts for this process."""
+
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=size))
+        self.totals = defaultdict(lambda: {"requests": 0, "throttled": 0, "hashes": 0})
+
+    def add(self, name, clock):
+        with self.lock:
+            totals = self.totals[name]
+            totals["requests"] += 1
+            totals["hashes"] += clock.count
+            self.samples[name].append(clock.seconds)
+
+    def throttled(self, name):
+        with self.lock:
+            self.totals[name]["throttled"] += 1
+
+    def summary(self):
+        with self.lock:
+            totals = {name: dict(values) for name, values in self.totals.items()}
+            samples = {name: sorted(values) for name, values in self.samples.items()}
+        for name, values in totals.items():
+            durations = samples.get(name)
+            if durations:
+                values["hash_ms_p50"] = round(percentile(durations, 0.50) * 1000, 2)
+                values["hash_ms_p95"] = round(percentile(durations, 0.95) * 1000, 2)
+                values["hash_ms_mean"] = round(
+                    sum(durations) / len(durations) * 1000, 2
+                )
+        return totals
+
+
+registry = None
+
+
+def getHashingRegistry():
+    global registry
+    if registry is None:
+        registry = HashingRegistry(settings.TODOS_TIMING_SAMPLE_SIZE)
+    return registry
+
+
+@contextmanager
+def measureHashing(name):
+    clock = HashClock()
+    token = currentClock.set(clock)
+    try:
+        yield clock
+    finally:
+        currentClock.reset(token)
+        getHashingRegistry().add(name, clock)
+
+
+def hashingStats():
+    hasher = hashers.get_hasher()
+    return {
+        "algorithm": hasher.algorithm,
+        "views": getHashingRegistry().summary(),
+    }
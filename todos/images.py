@@ -0,0 +1,119 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .cache import bumpUserVersion
+from .models import ToDoModel
+
+logger = logging.getLogger(__name__)
+
+# name: (max width/height, Pillow format, file extension)
+VARIANTS = {
+    "thumb": (160, "JPEG", "jpg"),
+    "card": (640, "JPEG", "jpg"),
+    "card_webp": (640, "WEBP", "webp"),
+}
+
+_executor = None
+_executorLock = threading.Lock()
+
+
+def getExecutor():
+    global _executor
+    with _executorLock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.TODOS_IMAGE_WORKERS,
+                thread_name_prefix="todo-images",
+            )
+        return _executor
+
+
+def needsVariants(todo):
+    return bool(todo.image) and todo.image_variants.get("source") != todo.image.name
+
+
+def variantPaths(variants):
+    return {path for name, path in variants.items() if name != "source"}
+
+
+def scheduleVariants(todoId, using=DEFAULT_DB_ALIAS):
+    """
+    Queue variant generation for a to-do once the current transaction on
+    ``using`` commits, so the request that saved the image never pays for
+    encoding.
+    """
+    if settings.TODOS_IMAGE_VARIANTS_ASYNC:
+        transaction.on_commit(
+            lambda: getExecutor().submit(runJob, todoId, using), using=using
+        )
+    else:
+        transaction.on_commit(lambda: generateVariants(todoId, using), using=using)
+
+
+def runJob(todoId, using):
+    try:
+        generateVariants(todoId, using)
+    except Exception:
+        logger.exception("Image variant generation failed for to-do %s", todoId)
+    finally:
+        close_old_connections()
+
+
+def encode(image, size, fmt):
+    variant = image.copy()
+    variant.thumbnail((size, size))
+    if fmt == "JPEG" and variant.mode not in ("RGB", "L"):
+        variant = variant.convert("RGB")
+    buffer = BytesIO()
+    variant.save(
+        buffer, fmt, quality=settings.TODOS_IMAGE_VARIANT_QUALITY, optimize=True
+    )
+    return buffer.getvalue()
+
+
+def generateVariants(todoId, using=DEFAULT_DB_ALIAS):
+    todos = ToDoModel.objects.using(using)
+    todo = (
+        todos.filter(pk=todoId).only("id", "user_id", "image", "image_variants").first()
+    )
+    if todo is None or not needsVariants(todo):
+        return
+
+    source = todo.image.name
+    storage = todo.image.storage
+    variants = {"source": source}
+    try:
+        with storage.open(source) as f:
+            image = Image.open(f)
+            image.load()
+    except (OSError, UnidentifiedImageError):
+        logger.warning("Could not read image %s for to-do %s", source, todoId)
+        image = None
+
+    if image is not None:
+        image = ImageOps.exif_transpose(image)
+        stem = os.path.splitext(os.path.basename(source))[0]
+        for name, (size, fmt, ext) in VARIANTS.items():
+            path = f"images/variants/{todoId}/{stem}_{name}.{ext}"
+            variants[name] = storage.save(path, ContentFile(encode(image, size, fmt)))
+
+    # Only record the variants if the image was not replaced meanwhile.
+    updated = todos.filter(pk=todoId, image=source).update(
+        image_variants=variants, updated_at=timezone.now()
+    )
+    if updated:
+        bumpUserVersion(todo.user_id)
+        stale = variantPaths(todo.image_variants) - variantPaths(variants)
+    else:
+        stale = variantPaths(variants)
+    for path in stale:
+        storage.delete(path)
@@ -0,0 +1,183 @@
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+
+from django.db import connections, router, transaction
+
+from .cache import bumpUserVersion
+from .counters import refreshCounters
+from .forms import ToDoAPIForm
+from .models import ToDoModel
+from .sync import logChanges
+
+COPY_FIELDS = (
+    "title",
+    "description",
+    "dueDate",
+    "priority",
+    "status",
+    "user",
+    "image",
+    "file",
+    "image_variants",
+    "created_at",
+    "updated_at",
+)
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+
+    @property
+    def processed(self):
+        return self.created + self.failed
+
+
+def parseCsv(stream):
+    for line, row in enumerate(csv.DictReader(stream), start=2):
+        yield line, row
+
+
+def parseNdjson(stream):
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except json.JSONDecodeError as e:
+            yield line, ValueError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(row, dict):
+            yield line, ValueError("Expected a JSON object.")
+            continue
+        yield line, row
+
+
+PARSERS = {
+    "csv": parseCsv,
+    "ndjson": parseNdjson,
+}
+
+
+def textStream(binary):
+    # utf-8-sig drops the byte-order mark Excel puts before "CSV UTF-8" files.
+    return io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+
+
+def canCopy(using):
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        # psycopg 3 cursors expose copy(); psycopg2 does not.
+        return hasattr(cursor.cursor, "copy")
+
+
+def reserveIds(count, using):
+    # COPY returns no rows, so the batch takes its ids from the sequence
+    # up front, the same way the inserts would have.
+    table = ToDoModel._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+            "FROM generate_series(1, %s)",
+            [table, count],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def copyInsert(todos, using):
+    for todo, pk in zip(todos, reserveIds(len(todos), using)):
+        todo.pk = pk
+    fields = [ToDoModel._meta.pk] + [
+        ToDoModel._meta.get_field(name) for name in COPY_FIELDS
+    ]
+    columns = ", ".join(f'"{f.column}"' for f in fields)
+    table = ToDoModel._meta.db_table
+    with connections[using].cursor() as cursor:
+        with cursor.cursor.copy(f'COPY "{table}" ({columns}) FROM STDIN') as copy:
+            for todo in todos:
+                copy.write_row(
+                    [
+                        # pre_save() fills auto_now(_add) like bulk_create does.
+                        f.get_db_prep_save(f.pre_save(todo, True), connections[using])
+                        for f in fields
+                    ]
+                )
+
+
+def writeBatch(user, batch, useCopy, using):
+    with transaction.atomic(using=using):
+        todos = ToDoModel.objects.using(using)
+        if useCopy:
+            copyInsert(batch, using)
+        else:
+            # PostgreSQL and SQLite return the new ids from the INSERT.
+            todos.bulk_create(batch)
+        ids = [todo.pk for todo in batch]
+        todos.filter(id__in=ids).updateSearchVector()
+        logChanges(user.pk, ids, using=using)
+
+
+def runImport(
+    user,
+    rows,
+    batchSize=1000,
+    useCopy=None,
+    onProgress=None,
+    maxErrors=100,
+    errorFile=None,
+):
+    """
+    Validate ``(line, row)`` pairs against ``ToDoAPIForm`` and insert the
+    valid ones for ``user`` in batches of ``batchSize``, each batch in its own
+    transaction. Uses PostgreSQL COPY when available unless ``useCopy`` is
+    False. Invalid rows are skipped; the report keeps the first ``maxErrors``
+    of them and ``errorFile``, if given, gets every one as a line of NDJSON.
+    """
+    using = router.db_for_write(ToDoModel, instance=user)
+    if useCopy is None or useCopy:
+        useCopy = canCopy(using)
+
+    report = ImportReport()
+    batch = []
+
+    def flush():
+        if batch:
+            writeBatch(user, batch, useCopy, using)
+            report.created += len(batch)
+            batch.clear()
+        if onProgress:
+            onProgress(report)
+
+    def fail(line, errors):
+        report.failed += 1
+        error = {"line": line, "errors": errors}
+        if len(report.errors) < maxErrors:
+            report.errors.append(error)
+        if errorFile is not None:
+            errorFile.write(json.dumps(error) + "\n")
+
+    for line, row in rows:
+        if isinstance(row, Exception):
+            fail(line, {"__all__": [str(row)]})
+            continue
+        # Owned from the start, so validation routes to the user's shard
+        # outside a request too.
+        form = ToDoAPIForm(row, instance=ToDoModel(user=user))
+        if not form.is_valid():
+            fail(line, form.errors)
+            continue
+        batch.append(form.save(commit=False))
+        if len(batch) >= batchSize:
+            flush()
+    flush()
+
+    if report.created:
+        refreshCounters(user.pk)
+        bumpUserVersion(user.pk)
+    return report
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from todos.archive import archiveCandidates, archiveTodos
+
+
+class Command(BaseCommand):
+    help = "Move completed and long-overdue to-dos into the archive table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.TODOS_ARCHIVE_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=settings.TODOS_ARCHIVE_PAUSE,
+            help="Seconds to sleep between batches.",
+        )
+        parser.add_argument(
+            "--max-batches", type=int, help="Stop after this many batches."
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the to-dos that would be archived.",
+        )
+
+    def handle(self, *args, **options):
+        doneAfter = settings.TODOS_ARCHIVE_DONE_AFTER
+        staleAfter = settings.TODOS_ARCHIVE_STALE_AFTER
+        if options["dry_run"]:
+            count = sum(qs.count() for qs in archiveCandidates(doneAfter, staleAfter))
+            self.stdout.write(f"{count} to-dos would be archived.")
+            return
+
+        archived = archiveTodos(
+            doneAfter,
+            staleAfter,
+            options["batch_size"],
+            pause=options["pause"],
+            maxBatches=options["max_batches"],
+            onBatch=lambda total: self.stdout.write(f"{total} archived"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} to-dos."))
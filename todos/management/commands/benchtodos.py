@@ -0,0 +1,151 @@
+import json
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.utils import timezone
+
+from todos.benchmark import SCENARIOS, Benchmark, idleStreams, renderComparison
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database and benchmark every to-do route, "
+        "writing per-route latency percentiles, throughput and query counts "
+        "as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument(
+            "--todos", type=int, default=1000, help="To-dos seeded per user."
+        )
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--routes",
+            nargs="+",
+            help="Only benchmark these URL names (default: all).",
+        )
+        parser.add_argument(
+            "--render-sizes",
+            nargs="*",
+            type=int,
+            default=[100, 1000, 5000],
+            help="List sizes for the list-rendering comparison (none to skip).",
+        )
+        parser.add_argument(
+            "--idle-streams",
+            nargs="*",
+            type=int,
+            default=[100, 1000],
+            help="Numbers of idle event streams to hold open (none to skip).",
+        )
+        parser.add_argument(
+            "--stream-idle-seconds",
+            type=float,
+            default=2.0,
+            help="How long the streams stay idle before one change is sent.",
+        )
+        parser.add_argument(
+            "--label", help="Free-form label stored in the report, e.g. a commit."
+        )
+        parser.add_argument(
+            "--output", help="Write the JSON report here instead of stdout."
+        )
+
+    def handle(self, *args, **options):
+        known = {scenario.name.split(":")[0] for scenario in SCENARIOS}
+        unknown = set(options["routes"] or ()) - known
+        if unknown:
+            raise CommandError(f"Unknown routes: {', '.join(sorted(unknown))}")
+
+        mediaRoot = tempfile.mkdtemp(prefix="todos-bench-media-")
+        uploadDir = tempfile.mkdtemp(prefix="todos-bench-uploads-")
+        oldName = connection.settings_dict["NAME"]
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(
+                MEDIA_ROOT=mediaRoot,
+                TODOS_UPLOAD_TEMP_DIR=uploadDir,
+                TODOS_IMAGE_VARIANTS_ASYNC=False,
+                # Every iteration logs in from the same address; measure the
+                # views, not the 429 page.
+                TODOS_THROTTLE_ENABLED=False,
+            ):
+                report = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(oldName, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(mediaRoot, ignore_errors=True)
+            shutil.rmtree(uploadDir, ignore_errors=True)
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as out:
+                out.write(output + "\n")
+            self.stderr.write(f"Report written to {options['output']}.")
+        else:
+            self.stdout.write(output)
+
+    def run(self, options):
+        bench = Benchmark(options["users"], options["todos"], options["batch_size"])
+        self.stderr.write(
+            f"Seeded {options['users']} users x {options['todos']} to-dos "
+            f"in {bench.seedSeconds:.1f}s."
+        )
+
+        def progress(name, summary):
+            self.stderr.write(
+                f"{name}: p50 {summary.get('p50_ms')}ms, "
+                f"{summary.get('queries_mean')} queries, {summary['errors']} errors"
+            )
+
+        routes = bench.runAll(
+            options["iterations"],
+            warmup=options["warmup"],
+            routes=options["routes"],
+            onRoute=progress,
+        )
+        render = {}
+        if options["render_sizes"]:
+            render = renderComparison(bench.user, options["render_sizes"])
+            for size, result in render.items():
+                self.stderr.write(
+                    f"render {size} rows: {result['legacy_render_ms']}ms -> "
+                    f"{result['fast_render_ms']}ms"
+                )
+        streams = {}
+        if options["idle_streams"]:
+            streams = idleStreams(
+                bench.user, options["idle_streams"], options["stream_idle_seconds"]
+            )
+            for count, result in streams.items():
+                self.stderr.write(
+                    f"{count} idle streams: {result['rss_bytes_per_stream']} bytes "
+                    f"and {result['threads_added']} threads added, change reached "
+                    f"all in {result['fanout_max_ms']}ms"
+                )
+        return {
+            "meta": {
+                "label": options["label"],
+                "created": timezone.now().isoformat(),
+                "database": connection.vendor,
+                "users": options["users"],
+                "todos_per_user": options["todos"],
+                "iterations": options["iterations"],
+                "warmup": options["warmup"],
+                "seed_seconds": round(bench.seedSeconds, 3),
+            },
+            "routes": routes,
+            "render": render,
+            "streams": streams,
+        }
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from todos.images import generateVariants, needsVariants
+from todos.models import ToDoModel
+from todos.sharding import shardAliases
+
+
+class Command(BaseCommand):
+    help = "Generate missing or outdated image variants for to-dos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        built = 0
+        for alias in shardAliases():
+            todos = (
+                ToDoModel.objects.using(alias)
+                .exclude(image="")
+                .exclude(image__isnull=True)
+                .only("id", "image", "image_variants")
+                .order_by("id")
+            )
+            for todo in todos.iterator(chunk_size=options["chunk_size"]):
+                if needsVariants(todo):
+                    generateVariants(todo.pk, alias)
+                    built += 1
+        self.stdout.write(self.style.SUCCESS(f"Built variants for {built} to-dos."))
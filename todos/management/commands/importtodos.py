@@ -0,0 +1,81 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from todos.importer import PARSERS, runImport
+from todos.models import User
+
+
+class Command(BaseCommand):
+    help = "Bulk import to-dos for a user from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path", help="Input file, or - for stdin.")
+        parser.add_argument("--format", choices=sorted(PARSERS), default=None)
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.TODOS_IMPORT_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Use bulk_create even when PostgreSQL COPY is available.",
+        )
+        parser.add_argument(
+            "--errors", help="Write the per-row error report to this NDJSON file."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist.")
+
+        path = options["path"]
+        fmt = options["format"] or ("ndjson" if path.endswith(".ndjson") else "csv")
+
+        def progress(report):
+            self.stdout.write(
+                f"{report.processed} rows processed, "
+                f"{report.created} created, {report.failed} failed"
+            )
+
+        errorFile = None
+        if options["errors"]:
+            errorFile = open(options["errors"], "w", encoding="utf-8")
+        try:
+            if path == "-":
+                report = self.run(user, sys.stdin, fmt, options, progress, errorFile)
+            else:
+                with open(path, encoding="utf-8-sig", newline="") as stream:
+                    report = self.run(user, stream, fmt, options, progress, errorFile)
+        finally:
+            if errorFile is not None:
+                errorFile.close()
+
+        if errorFile is None:
+            for error in report.errors:
+                self.stderr.write(f"line {error['line']}: {dict(error['errors'])}")
+            if report.failed > len(report.errors):
+                self.stderr.write(
+                    f"{report.failed - len(report.errors)} more errors; "
+                    "use --errors to write them all to a file."
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {report.created} to-dos, {report.failed} rows failed."
+            )
+        )
+
+    def run(self, user, stream, fmt, options, progress, errorFile):
+        return runImport(
+            user,
+            PARSERS[fmt](stream),
+            batchSize=options["batch_size"],
+            useCopy=False if options["no_copy"] else None,
+            onProgress=progress,
+            maxErrors=20,
+            errorFile=errorFile,
+        )
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from todos.sharding import shardAliases
+from todos.sync import pruneChanges
+
+
+class Command(BaseCommand):
+    help = "Delete old entries of the to-do change log used by the sync API."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=settings.TODOS_SYNC_RETENTION.days,
+            help="Age in days after which log entries are deleted.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["older_than"])
+        pruned = sum(
+            pruneChanges(alias, cutoff, options["batch_size"])
+            for alias in shardAliases()
+        )
+        self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} log entries."))
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from todos.models import ChunkedUpload
+from todos.sharding import shardAliases
+from todos.uploads import discardUpload
+
+
+class Command(BaseCommand):
+    help = "Delete resumable uploads that were abandoned or already finalized."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=24,
+            help="Age in hours after which unfinished uploads are discarded.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["older_than"])
+        purged = 0
+        for alias in shardAliases():
+            uploads = ChunkedUpload.objects.using(alias).filter(created_at__lt=cutoff)
+            for upload in uploads.iterator():
+                discardUpload(upload)
+                purged += 1
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} uploads."))
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from todos.models import User
+from todos.sharding import moveUser, planRebalance, shardFor, shardLoads
+
+
+class Command(BaseCommand):
+    help = (
+        "Move users' to-dos between shards, either one user (--user/--to) or "
+        "as many users as it takes to even out the to-do count per shard."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Id of a user to move.")
+        parser.add_argument("--to", help="Shard to move --user to.")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.1,
+            help="Accepted deviation of a shard from the mean load (fraction).",
+        )
+        parser.add_argument("--max-moves", type=int, default=10)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--grace",
+            type=float,
+            default=5.0,
+            help="Seconds to wait after switching a user to the new shard for "
+            "requests still using the old one.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only print the planned moves."
+        )
+
+    def handle(self, *args, **options):
+        if not settings.TODOS_SHARDS:
+            raise CommandError("Sharding is not configured (DB_SHARDS).")
+
+        if options["user"] is not None:
+            if options["to"] not in settings.TODOS_SHARDS:
+                raise CommandError(f"--to must be one of {settings.TODOS_SHARDS}.")
+            if not User.objects.filter(pk=options["user"]).exists():
+                raise CommandError(f"User {options['user']} does not exist.")
+            moves = [(options["user"], shardFor(options["user"]), options["to"], None)]
+        else:
+            self.stdout.write(f"Loads: {shardLoads()}")
+            moves = planRebalance(options["tolerance"], options["max_moves"])
+
+        for userId, source, target, todos in moves:
+            self.stdout.write(
+                f"user {userId}: {source} -> {target}"
+                + (f" ({todos} to-dos)" if todos is not None else "")
+            )
+            if not options["dry_run"]:
+                moveUser(
+                    userId,
+                    target,
+                    batchSize=options["batch_size"],
+                    grace=options["grace"],
+                    log=self.stdout.write,
+                )
+        if not options["dry_run"] and options["user"] is None:
+            self.stdout.write(f"Loads: {shardLoads()}")
+        self.stdout.write(self.style.SUCCESS(f"{len(moves)} moves."))
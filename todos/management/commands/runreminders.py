@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from todos.reminders import ReminderScheduler, getSink
+from todos.sharding import shardAliases
+
+
+class Command(BaseCommand):
+    help = "Send due-date reminders, either once (for cron) or as a long-lived worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Send what is due now and exit instead of running forever.",
+        )
+        parser.add_argument(
+            "--poll",
+            type=int,
+            default=60,
+            help="Seconds between rescans for new or rescheduled to-dos.",
+        )
+        parser.add_argument(
+            "--sink",
+            help="Dotted path of the sink class (default: TODOS_REMINDER_SINK).",
+        )
+        parser.add_argument(
+            "--shard",
+            default=DEFAULT_DB_ALIAS,
+            help="Database whose to-dos to remind about; run one worker per shard.",
+        )
+        parser.add_argument(
+            "--name",
+            help="Checkpoint name (default: the shard); separate workers need "
+            "separate names.",
+        )
+
+    def handle(self, *args, **options):
+        if options["shard"] not in shardAliases():
+            raise CommandError(f"Unknown shard {options['shard']}.")
+        scheduler = ReminderScheduler(
+            getSink(options["sink"]),
+            name=options["name"] or options["shard"],
+            using=options["shard"],
+        )
+        if options["once"]:
+            scheduler.runOnce()
+        else:
+            try:
+                scheduler.runForever(options["poll"])
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(self.style.SUCCESS(f"Sent {scheduler.sent} reminders."))
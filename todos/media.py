@@ -0,0 +1,162 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import (
+    content_disposition_header,
+    http_date,
+    parse_http_date_safe,
+    quote_etag,
+)
+
+from .models import ArchivedTodo, ToDoModel
+
+READ_BLOCK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+VARIANT_RE = re.compile(r"^images/variants/(\d+)/")
+
+
+def ownsMedia(user, path):
+    match = VARIANT_RE.match(path)
+    for model in (ToDoModel, ArchivedTodo):
+        todos = model.objects.filter(user=user)
+        if match:
+            owned = todos.filter(pk=int(match.group(1))).exists()
+        else:
+            owned = todos.filter(Q(image=path) | Q(file=path)).exists()
+        if owned:
+            return True
+    return False
+
+
+def fileEtag(stat):
+    return quote_etag(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+
+
+def parseRange(header, size):
+    """
+    Parse a single-range ``Range`` header into an inclusive ``(start, end)``.
+    Returns ``None`` to serve the whole file (absent or multi-range headers)
+    and raises ``ValueError`` when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+def ifRangeMatches(request, etag, mtime):
+    ifRange = request.headers.get("If-Range")
+    if not ifRange:
+        return True
+    if ifRange.startswith(('"', 'W/"')):
+        return ifRange == etag
+    since = parse_http_date_safe(ifRange)
+    return since is not None and int(mtime) <= since
+
+
+def readRange(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(READ_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+async def areadRange(path, start, length):
+    # Under ASGI, Django reads a sync iterator into a list before sending
+    # any of it; reads here run on the executor, one block at a time.
+    with open(path, "rb") as f:
+        f.seek(start)
+        read = sync_to_async(f.read, thread_sensitive=False)
+        while length > 0:
+            block = await read(min(READ_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def streamFile(request, path, start, end, contentType):
+    read = areadRange if isinstance(request, ASGIRequest) else readRange
+    response = StreamingHttpResponse(
+        read(path, start, end - start + 1), content_type=contentType
+    )
+    response["Content-Length"] = str(end - start + 1)
+    return response
+
+
+def mediaResponse(request, name, fullPath):
+    """
+    Build the response for a media file: 304/412 for conditional requests,
+    an X-Accel-Redirect/X-Sendfile header when the front-end server is
+    configured to do the transfer, otherwise the file itself (206 for a
+    satisfiable ``Range``), streamed by async reads when served over ASGI.
+    """
+    stat = os.stat(fullPath)
+    etag = fileEtag(stat)
+    contentType = mimetypes.guess_type(fullPath)[0] or "application/octet-stream"
+
+    headers = HttpResponse()
+    headers["ETag"] = etag
+    headers["Last-Modified"] = http_date(stat.st_mtime)
+    headers["Cache-Control"] = "private, max-age=0, must-revalidate"
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime), response=headers
+    )
+    if conditional is not headers:
+        return conditional
+
+    offload = settings.TODOS_MEDIA_OFFLOAD
+    if offload == "x-accel-redirect":
+        response = HttpResponse(content_type=contentType)
+        response["X-Accel-Redirect"] = settings.TODOS_MEDIA_ACCEL_PREFIX + quote(name)
+    elif offload == "x-sendfile":
+        response = HttpResponse(content_type=contentType)
+        response["X-Sendfile"] = fullPath
+    else:
+        try:
+            byteRange = parseRange(request.headers.get("Range"), stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{stat.st_size}"
+            return response
+        if byteRange and ifRangeMatches(request, etag, stat.st_mtime):
+            start, end = byteRange
+            response = streamFile(request, fullPath, start, end, contentType)
+            response.status_code = 206
+            response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+        elif isinstance(request, ASGIRequest):
+            response = streamFile(request, fullPath, 0, stat.st_size - 1, contentType)
+            response["Content-Disposition"] = content_disposition_header(
+                False, os.path.basename(fullPath)
+            )
+        else:
+            # FileResponse hands the open file to wsgi.file_wrapper, which
+            # servers such as gunicorn turn into os.sendfile().
+            response = FileResponse(open(fullPath, "rb"), content_type=contentType)
+        response["Accept-Ranges"] = "bytes"
+
+    for header in ("ETag", "Last-Modified", "Cache-Control"):
+        response[header] = headers[header]
+    return response
@@ -0,0 +1,253 @@
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+from .routers import RequestRouting, currentRouting
+
+logger = logging.getLogger("todos.timing")
+
+currentStats = ContextVar("todos_request_stats", default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.viewStart = None
+        self.queries = 0
+        self.sqlTime = 0.0
+        self.templateTime = 0.0
+        self.rendering = False
+        self.statements = Counter()
+
+    def duplicates(self):
+        threshold = settings.TODOS_TIMING_DUPLICATE_THRESHOLD
+        return {sql: n for sql, n in self.statements.items() if n >= threshold}
+
+
+def recordQuery(execute, sql, params, many, context):
+    stats = currentStats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sqlTime += time.perf_counter() - start
+        stats.queries += 1
+        # Parameters are bound separately, so the same statement text run
+        # repeatedly with different values is the usual N+1 signature.
+        stats.statements[sql] += 1
+
+
+def installQueryWrapper(connection, **kwargs):
+    if recordQuery not in connection.execute_wrappers:
+        connection.execute_wrappers.append(recordQuery)
+
+
+_originalRender = Template.render
+
+
+def timedRender(self, context):
+    stats = currentStats.get()
+    if stats is None or stats.rendering:
+        return _originalRender(self, context)
+    stats.rendering = True
+    start = time.perf_counter()
+    try:
+        return _originalRender(self, context)
+    finally:
+        stats.templateTime += time.perf_counter() - start
+        stats.rendering = False
+
+
+class TimingRegistry:
+    """Rolling per-URL-name request durations for this process."""
+
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=size))
+
+    def add(self, name, total, queries):
+        with self.lock:
+            self.samples[name].append((total, queries))
+
+    def summary(self):
+        with self.lock:
+            samples = {name: list(values) for name, values in self.samples.items()}
+        return {name: summarize(values) for name, values in samples.items()}
+
+
+def percentile(ordered, fraction):
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(values):
+    durations = sorted(total for total, _ in values)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(durations, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(durations, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(durations, 0.99) * 1000, 2),
+        "mean_queries": round(sum(q for _, q in values) / len(values), 2),
+    }
+
+
+registry = None
+
+
+def getRegistry():
+    global registry
+    if registry is None:
+        registry = TimingRegistry(settings.TODOS_TIMING_SAMPLE_SIZE)
+    return registry
+
+
+class RequestTimingMiddleware:
+    """
+    Opt-in per-request instrumentation. Records query count, SQL time,
+    template render time and view time, reports them in a ``Server-Timing``
+    header and a JSON log line on ``todos.timing``, warns about statements
+    repeated within one request (likely N+1 patterns) and feeds the rolling
+    percentiles served by ``/todos/api/timing_stats``. Put it first in
+    MIDDLEWARE so queries issued by the session and auth middleware count.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.isAsync = iscoroutinefunction(get_response)
+        if self.isAsync:
+            markcoroutinefunction(self)
+        Template.render = timedRender
+        connection_created.connect(installQueryWrapper)
+        getRegistry()
+
+    def __call__(self, request):
+        if self.isAsync:
+            return self.__acall__(request)
+        stats, token = self.begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            currentStats.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats, token = self.begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            currentStats.reset(token)
+        return self.finish(request, response, stats)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = currentStats.get()
+        if stats is not None:
+            stats.viewStart = time.perf_counter()
+
+    def begin(self):
+        for connection in connections.all(initialized_only=True):
+            installQueryWrapper(connection)
+        stats = RequestStats()
+        return stats, currentStats.set(stats)
+
+    def finish(self, request, response, stats):
+        end = time.perf_counter()
+        total = end - stats.start
+        view = end - stats.viewStart if stats.viewStart else 0.0
+        match = getattr(request, "resolver_match", None)
+        urlName = (match.view_name if match else None) or "<unresolved>"
+        duplicates = stats.duplicates()
+
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={stats.sqlTime * 1000:.2f};desc="{stats.queries} queries"',
+                f"tpl;dur={stats.templateTime * 1000:.2f}",
+                f"view;dur={view * 1000:.2f}",
+                f"total;dur={total * 1000:.2f}",
+            ]
+        )
+        getRegistry().add(urlName, total, stats.queries)
+        logger.info(
+            json.dumps(
+                {
+                    "url_name": urlName,
+                    "path": request.path,
+                    "method": request.method,
+                    "status": response.status_code,
+                    "queries": stats.queries,
+                    "sql_ms": round(stats.sqlTime * 1000, 2),
+                    "template_ms": round(stats.templateTime * 1000, 2),
+                    "view_ms": round(view * 1000, 2),
+                    "total_ms": round(total * 1000, 2),
+                    "duplicate_queries": len(duplicates),
+                }
+            )
+        )
+        for sql, count in duplicates.items():
+            logger.warning(
+                json.dumps(
+                    {
+                        "url_name": urlName,
+                        "path": request.path,
+                        "repeated_query": sql,
+                        "count": count,
+                    }
+                )
+            )
+        return response
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Sets up the per-request state of ``todos.routers``: the read replica
+    for the request and a memo of the users' shards. When the request wrote
+    to the primary, pins its session there for TODOS_PRIMARY_STICKY_SECONDS.
+    Goes right after SessionMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.isAsync = iscoroutinefunction(get_response)
+        if self.isAsync:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.isAsync:
+            return self.__acall__(request)
+        routing = RequestRouting(request)
+        token = currentRouting.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            currentRouting.reset(token)
+        if routing.wrote:
+            routing.pin()
+        return response
+
+    async def __acall__(self, request):
+        routing = RequestRouting(request)
+        token = currentRouting.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            currentRouting.reset(token)
+        if routing.wrote:
+            # Loading the session may query the database.
+            await sync_to_async(routing.pin)()
+        return response
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0002_todomodel_file_todomodel_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todomodel',
+            index=models.Index(fields=['user', 'dueDate', 'id'], name='todo_user_due_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todomodel',
+            index=models.Index(fields=['user', 'priority', 'dueDate', 'id'], name='todo_user_prio_due_id_idx'),
+        ),
+    ]
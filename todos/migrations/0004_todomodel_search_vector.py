@@ -0,0 +1,47 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class AddPostgresIndex(migrations.AddIndex):
+    # GIN indexes only exist on PostgreSQL; elsewhere only the state changes.
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def populate_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    ToDoModel = apps.get_model('todos', 'ToDoModel')
+    ToDoModel.objects.using(schema_editor.connection.alias).update(
+        search_vector=django.contrib.postgres.search.SearchVector('title', weight='A')
+        + django.contrib.postgres.search.SearchVector('description', weight='B')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0003_todomodel_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todomodel',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        AddPostgresIndex(
+            model_name='todomodel',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='todo_search_vector_idx'),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
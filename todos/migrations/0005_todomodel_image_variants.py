@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0004_todomodel_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todomodel',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
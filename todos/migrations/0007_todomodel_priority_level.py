@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0006_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todomodel',
+            name='priority_level',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        # Nullable so that unapplying can re-add the column before refilling it.
+        migrations.AlterField(
+            model_name='todomodel',
+            name='priority',
+            field=models.CharField(max_length=25, null=True),
+        ),
+    ]
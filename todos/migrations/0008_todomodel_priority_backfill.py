@@ -0,0 +1,70 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:20
+
+from django.db import migrations, transaction
+from django.db.models import Case, Value, When
+from django.db.models.functions import Lower, Trim
+from django.db.models.lookups import In
+
+BATCH_SIZE = 5000
+
+PRIORITY_ALIASES = {
+    3: ['high', 'h', 'urgent', 'important', '3'],
+    2: ['medium', 'med', 'm', 'normal', '2'],
+    1: ['low', 'l', '1'],
+}
+PRIORITY_NAMES = {3: 'high', 2: 'medium', 1: 'low'}
+
+
+def batches(queryset):
+    # Walk the ids that exist: shards hand them out from 1 << 40, so
+    # stepping through every id up to the largest would never finish.
+    last = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last).order_by('id').values_list('id', flat=True)[:BATCH_SIZE])
+        if not ids:
+            return
+        last = ids[-1]
+        yield queryset.filter(id__gte=ids[0], id__lte=last)
+
+
+def normalize_priority(apps, schema_editor):
+    ToDoModel = apps.get_model('todos', 'ToDoModel')
+    todos = ToDoModel.objects.using(schema_editor.connection.alias)
+    normalized = Lower(Trim('priority'))
+    level = Case(
+        *[
+            When(In(normalized, aliases), then=Value(value))
+            for value, aliases in PRIORITY_ALIASES.items()
+        ],
+        default=Value(2),
+    )
+    for batch in batches(todos):
+        with transaction.atomic(using=schema_editor.connection.alias):
+            batch.update(priority_level=level)
+
+
+def denormalize_priority(apps, schema_editor):
+    ToDoModel = apps.get_model('todos', 'ToDoModel')
+    todos = ToDoModel.objects.using(schema_editor.connection.alias)
+    name = Case(
+        *[When(priority_level=value, then=Value(n)) for value, n in PRIORITY_NAMES.items()],
+        default=Value('medium'),
+    )
+    for batch in batches(todos):
+        with transaction.atomic(using=schema_editor.connection.alias):
+            batch.update(priority=name)
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own, so the data update never holds its
+    # locks for the whole table at once. The schema changes on either side
+    # are separate, atomic migrations.
+    atomic = False
+
+    dependencies = [
+        ('todos', '0007_todomodel_priority_level'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_priority, denormalize_priority),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0008_todomodel_priority_backfill'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='todomodel',
+            name='todo_user_prio_due_id_idx',
+        ),
+        migrations.RemoveField(
+            model_name='todomodel',
+            name='priority',
+        ),
+        migrations.RenameField(
+            model_name='todomodel',
+            old_name='priority_level',
+            new_name='priority',
+        ),
+        migrations.AlterField(
+            model_name='todomodel',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')], default=2),
+        ),
+        migrations.AddField(
+            model_name='todomodel',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Open'), (1, 'Done')], default=0),
+        ),
+        migrations.AddIndex(
+            model_name='todomodel',
+            index=models.Index(fields=['user', '-priority', 'dueDate', 'id'], name='todo_user_prio_due_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todomodel',
+            index=models.Index(fields=['user', 'status', 'dueDate', 'id'], name='todo_user_status_due_id_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:22
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0009_todomodel_priority_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='todoCounters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('day', models.DateField()),
+                ('open', models.IntegerField(default=0)),
+                ('overdue', models.IntegerField(default=0)),
+                ('due_today', models.IntegerField(default=0)),
+                ('due_week', models.IntegerField(default=0)),
+                ('priority_low', models.IntegerField(default=0)),
+                ('priority_medium', models.IntegerField(default=0)),
+                ('priority_high', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:23
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0010_todocounters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderCheckpoint',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('dueDate', models.DateTimeField()),
+                ('todo_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='todomodel',
+            index=models.Index(condition=models.Q(('status', 0)), fields=['dueDate', 'id'], name='todo_open_due_id_idx'),
+        ),
+    ]
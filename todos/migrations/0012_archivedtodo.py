@@ -0,0 +1,44 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0011_reminders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTodo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('dueDate', models.DateTimeField()),
+                ('priority', models.PositiveSmallIntegerField(choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')], default=2)),
+                ('status', models.PositiveSmallIntegerField(choices=[(0, 'Open'), (1, 'Done')], default=0)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='images/')),
+                ('file', models.FileField(blank=True, null=True, upload_to='files/')),
+                ('image_variants', models.JSONField(blank=True, default=dict)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='todomodel',
+            index=models.Index(condition=models.Q(('status', 1)), fields=['dueDate', 'id'], name='todo_done_due_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedtodo',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archivedTodos', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtodo',
+            index=models.Index(fields=['user', 'dueDate', 'id'], name='archive_user_due_id_idx'),
+        ),
+    ]
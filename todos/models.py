@@ -1,5 +1,15 @@
+import uuid
+
 from django.utils import timezone
-from django.db import models
+from django.db import connections, models
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    SearchVectorField,
+)
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -50,14 +60,292 @@ class User(AbstractBaseUser, PermissionsMixin):
         return self.username
 
 
+class Priority(models.IntegerChoices):
+    LOW = 1, "Low"
+    MEDIUM = 2, "Medium"
+    HIGH = 3, "High"
+
+    @classmethod
+    def normalize(cls, value):
+        # Accept the labels ("high", " Medium ") used by older clients and
+        # exports alongside the integer values.
+        if isinstance(value, str) and value.strip().upper() in cls.names:
+            return cls[value.strip().upper()].value
+        return value
+
+
+class Status(models.IntegerChoices):
+    OPEN = 0, "Open"
+    DONE = 1, "Done"
+
+
+class ToDoQuerySet(models.QuerySet):
+    def isPostgres(self):
+        return connections[self.db].vendor == "postgresql"
+
+    def updateSearchVector(self):
+        if self.isPostgres():
+            self.update(
+                search_vector=SearchVector("title", weight="A")
+                + SearchVector("description", weight="B")
+            )
+
+    def search(self, query):
+        if self.isPostgres():
+            searchQuery = SearchQuery(query, search_type="websearch")
+            return (
+                self.filter(search_vector=searchQuery)
+                .annotate(rank=SearchRank(F("search_vector"), searchQuery))
+                .order_by("-rank", "dueDate", "id")
+            )
+
+        # LIKE fallback for databases without full-text search (SQLite):
+        # every term must appear, title matches rank above description ones.
+        terms = query.split()
+        queryset = self
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(description__icontains=term)
+            )
+        return queryset.annotate(
+            rank=Case(
+                When(title__icontains=query, then=Value(2)),
+                When(description__icontains=query, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        ).order_by("-rank", "dueDate", "id")
+
+
 class ToDoModel(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     dueDate = models.DateTimeField()
-    priority = models.CharField(max_length=25)
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="todos")
+    priority = models.PositiveSmallIntegerField(
+        choices=Priority.choices, default=Priority.MEDIUM
+    )
+    status = models.PositiveSmallIntegerField(
+        choices=Status.choices, default=Status.OPEN
+    )
+    # Users live on the global database and to-dos on the user's shard
+    # (see todos.sharding), so the database cannot enforce this relation.
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="todos", db_constraint=False
+    )
+    image = models.ImageField(upload_to="images/", null=True, blank=True)
+    file = models.FileField(upload_to="files/", null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ToDoQuerySet.as_manager()
+
+    Priority = Priority
+    Status = Status
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="todo_search_vector_idx"),
+            models.Index(fields=["user", "dueDate", "id"], name="todo_user_due_id_idx"),
+            models.Index(
+                fields=["user", "-priority", "dueDate", "id"],
+                name="todo_user_prio_due_id_idx",
+            ),
+            models.Index(
+                fields=["user", "status", "dueDate", "id"],
+                name="todo_user_status_due_id_idx",
+            ),
+            # Max(updated_at)/Count per user for the list page validators.
+            models.Index(fields=["user", "updated_at"], name="todo_user_updated_idx"),
+            # Global scan of upcoming open to-dos for the reminder worker.
+            models.Index(
+                fields=["dueDate", "id"],
+                condition=Q(status=Status.OPEN),
+                name="todo_open_due_id_idx",
+            ),
+            # Oldest completed to-dos first, for archival.
+            models.Index(
+                fields=["dueDate", "id"],
+                condition=Q(status=Status.DONE),
+                name="todo_done_due_id_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    @property
+    def imageUrls(self):
+        if not self.image:
+            return {}
+        storage = self.image.storage
+        urls = {
+            name: storage.url(path)
+            for name, path in self.image_variants.items()
+            if name != "source" and self.image_variants.get("source") == self.image.name
+        }
+        urls["original"] = self.image.url
+        return urls
+
+
+class ArchivedTodo(models.Model):
+    """
+    A to-do moved out of ``ToDoModel`` by ``todos.archive``. Keeps the
+    original id so attachments and variant paths stay resolvable.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    dueDate = models.DateTimeField()
+    priority = models.PositiveSmallIntegerField(
+        choices=Priority.choices, default=Priority.MEDIUM
+    )
+    status = models.PositiveSmallIntegerField(
+        choices=Status.choices, default=Status.OPEN
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="archivedTodos",
+        db_constraint=False,
+    )
     image = models.ImageField(upload_to="images/", null=True, blank=True)
     file = models.FileField(upload_to="files/", null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "dueDate", "id"], name="archive_user_due_id_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class TodoCounters(models.Model):
+    """
+    Dashboard counts of a user's open to-dos. Kept current incrementally by
+    ``todos.counters``; the time buckets are relative to ``day`` and are
+    recomputed when the day changes.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="todoCounters",
+        db_constraint=False,
+    )
+    day = models.DateField()
+    open = models.IntegerField(default=0)
+    overdue = models.IntegerField(default=0)
+    due_today = models.IntegerField(default=0)
+    due_week = models.IntegerField(default=0)
+    priority_low = models.IntegerField(default=0)
+    priority_medium = models.IntegerField(default=0)
+    priority_high = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Counters for user {self.user_id} on {self.day}"
+
+
+class TodoChange(models.Model):
+    """
+    One entry of a user's append-only to-do change log, read by the sync
+    API (``todos.sync``). ``revision`` counts up per user in commit order;
+    ``deleted`` marks a tombstone.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="todoChanges",
+        db_constraint=False,
+    )
+    todo_id = models.BigIntegerField()
+    revision = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "revision"], name="todochange_user_revision_uniq"
+            ),
+        ]
+        indexes = [
+            # Oldest entries first, for pruning.
+            models.Index(fields=["created_at"], name="todochange_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}@{self.revision}: {self.todo_id}"
+
+
+class TodoSyncState(models.Model):
+    """
+    The last revision handed out from a user's change log, and the last
+    one pruned from it. Updating the row locks it, which orders revisions
+    by commit.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="syncState",
+        db_constraint=False,
+    )
+    revision = models.BigIntegerField(default=0)
+    pruned_through = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Sync state for user {self.user_id} at {self.revision}"
+
+
+class ReminderCheckpoint(models.Model):
+    """Position of the last reminder sent by a reminder worker."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    dueDate = models.DateTimeField()
+    todo_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name}: {self.dueDate} #{self.todo_id}"
+
+
+class UserShard(models.Model):
+    """
+    The database holding a user's to-dos. Kept on the global database;
+    users without an entry live on ``default``.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="shard"
+    )
+    shard = models.CharField(max_length=50)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"User {self.user_id} on {self.shard}"
+
+
+class ChunkedUpload(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    todo = models.ForeignKey(ToDoModel, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
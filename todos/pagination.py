@@ -0,0 +1,124 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+SORT_FIELDS = {
+    "dueDate": ("dueDate", "id"),
+    "-dueDate": ("-dueDate", "-id"),
+    "-priority": ("-priority", "dueDate", "id"),
+}
+DEFAULT_SORT = "dueDate"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def fieldName(field):
+    return field.lstrip("-")
+
+
+def encodeCursor(row, ordering):
+    values = []
+    for field in ordering:
+        name = fieldName(field)
+        # Rows are model instances or, for .values() projections, dicts.
+        value = row[name] if isinstance(row, dict) else getattr(row, name)
+        values.append(value.isoformat() if isinstance(value, datetime) else value)
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decodeValue(field, value, nullable):
+    name = fieldName(field)
+    if value is None and name in nullable:
+        return None
+    if name == "dueDate":
+        if not isinstance(value, str):
+            raise ValueError(f"Bad {name} in cursor.")
+        value = datetime.fromisoformat(value)
+        if value.tzinfo is None:
+            raise ValueError(f"Naive {name} in cursor.")
+        return value
+    # Every other sort field (id, priority, revision) is a bigint at most.
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f"Bad {name} in cursor.")
+    if not -(2**63) <= value < 2**63:
+        raise ValueError(f"{name} out of range in cursor.")
+    return value
+
+
+def decodeCursor(cursor, ordering, nullable=()):
+    """
+    The values of ``ordering`` encoded in ``cursor``, checked to be of the
+    fields' types (``nullable`` fields may also be None). Anything else,
+    tampered cursors included, raises ``InvalidCursor``.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError("Cursor does not match the sort order.")
+        return [
+            decodeValue(field, value, nullable)
+            for field, value in zip(ordering, values)
+        ]
+    except (ValueError, TypeError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def afterCursor(ordering, values):
+    """
+    Lexicographic "row comes after the cursor" predicate for ``ordering``:
+    ``(a > x) OR (a = x AND b > y) OR ...`` with each comparison following
+    its own field's direction.
+    """
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = fieldName(field)
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= Q(**equal, **{f"{name}__{lookup}": value})
+        equal[name] = value
+    return condition
+
+
+def keysetQuery(queryset, sort=DEFAULT_SORT, cursor=None, pageSize=50):
+    """
+    Narrow ``queryset`` to one page in ``sort`` order, plus one extra row to
+    tell whether another page follows. The page is located with a range
+    predicate on the matching composite index rather than an OFFSET, so
+    every page costs the same regardless of depth.
+    """
+    ordering = SORT_FIELDS.get(sort, SORT_FIELDS[DEFAULT_SORT])
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(
+            afterCursor(ordering, decodeCursor(cursor, ordering))
+        )
+    return queryset[: pageSize + 1]
+
+
+def splitPage(rows, sort, pageSize):
+    nextCursor = None
+    if len(rows) > pageSize:
+        rows = rows[:pageSize]
+        ordering = SORT_FIELDS.get(sort, SORT_FIELDS[DEFAULT_SORT])
+        nextCursor = encodeCursor(rows[-1], ordering)
+    return rows, nextCursor
+
+
+def keysetPage(queryset, sort=DEFAULT_SORT, cursor=None, pageSize=50):
+    """
+    Return one page of ``queryset`` and the cursor for the next page
+    (``None`` on the last page).
+    """
+    rows = list(keysetQuery(queryset, sort, cursor, pageSize))
+    return splitPage(rows, sort, pageSize)
+
+
+async def akeysetPage(queryset, sort=DEFAULT_SORT, cursor=None, pageSize=50):
+    rows = [row async for row in keysetQuery(queryset, sort, cursor, pageSize)]
+    return splitPage(rows, sort, pageSize)
@@ -0,0 +1,222 @@
+import heapq
+import json
+import logging
+import time
+import urllib.request
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ReminderCheckpoint, Status, ToDoModel, User
+from .pagination import afterCursor
+
+logger = logging.getLogger(__name__)
+
+ORDERING = ("dueDate", "id")
+
+
+@dataclass
+class Reminder:
+    todoId: int
+    userId: int
+    email: str
+    title: str
+    dueDate: datetime
+
+
+class LogSink:
+    def send(self, reminders):
+        for reminder in reminders:
+            logger.info(
+                "Reminder: to-do %s '%s' for user %s is due at %s",
+                reminder.todoId,
+                reminder.title,
+                reminder.userId,
+                reminder.dueDate.isoformat(),
+            )
+
+
+class EmailSink:
+    """Send one email per reminder through the configured email backend."""
+
+    def send(self, reminders):
+        send_mass_mail(
+            [
+                (
+                    f"Reminder: {reminder.title}",
+                    f"Your to-do '{reminder.title}' is due at "
+                    f"{timezone.localtime(reminder.dueDate):%Y-%m-%d %H:%M}.",
+                    None,
+                    [reminder.email],
+                )
+                for reminder in reminders
+                if reminder.email
+            ],
+            fail_silently=False,
+        )
+
+
+class WebhookSink:
+    """POST each batch of reminders as JSON to ``TODOS_REMINDER_WEBHOOK_URL``."""
+
+    def send(self, reminders):
+        url = settings.TODOS_REMINDER_WEBHOOK_URL
+        if not url:
+            logger.warning(
+                "No webhook URL configured, dropped %s reminders.", len(reminders)
+            )
+            return
+        body = json.dumps(
+            {"reminders": [asdict(reminder) for reminder in reminders]},
+            default=lambda value: value.isoformat(),
+        ).encode()
+        request = urllib.request.Request(
+            url, data=body, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+
+
+def getSink(path=None):
+    return import_string(path or settings.TODOS_REMINDER_SINK)()
+
+
+class ReminderScheduler:
+    """
+    Fire a reminder ``lead`` before each open to-do's due date.
+
+    Upcoming to-dos are loaded with a keyset range scan over
+    ``todo_open_due_id_idx`` (only those due within the lead time plus
+    ``horizon``) into a heap ordered by due date. Due entries are
+    re-checked against the database in batches, handed to the sink, and the
+    ``(dueDate, id)`` of the last one sent is saved as the checkpoint. A
+    restart resumes after the checkpoint, so nothing is rescanned or sent
+    twice, except a batch that was sent when the process died before the
+    checkpoint was saved (delivery is at-least-once). A scheduler covers
+    the to-dos of one database, ``using``; run one per shard.
+    """
+
+    def __init__(
+        self,
+        sink,
+        name="default",
+        lead=None,
+        horizon=None,
+        batchSize=None,
+        using=DEFAULT_DB_ALIAS,
+    ):
+        self.sink = sink
+        self.name = name
+        self.todos = ToDoModel.objects.using(using)
+        self.lead = lead if lead is not None else settings.TODOS_REMINDER_LEAD
+        self.horizon = (
+            horizon if horizon is not None else settings.TODOS_REMINDER_HORIZON
+        )
+        self.batchSize = batchSize or settings.TODOS_REMINDER_BATCH_SIZE
+        self.heap = []
+        self.checkpoint = self.loadCheckpoint()
+        self.sent = 0
+
+    def loadCheckpoint(self):
+        row = ReminderCheckpoint.objects.filter(name=self.name).first()
+        if row is None:
+            # First run: remind about what is due from now on, not history.
+            row = ReminderCheckpoint.objects.create(
+                name=self.name, dueDate=timezone.now() + self.lead, todo_id=0
+            )
+        return (row.dueDate, row.todo_id)
+
+    def saveCheckpoint(self, position):
+        self.checkpoint = position
+        ReminderCheckpoint.objects.filter(name=self.name).update(
+            dueDate=position[0], todo_id=position[1], updated_at=timezone.now()
+        )
+
+    def refresh(self, now):
+        """
+        Rebuild the heap from the checkpoint up to the horizon, which also
+        picks up to-dos created or rescheduled since the last scan.
+        """
+        until = now + self.lead + self.horizon
+        earliest = now + self.lead - settings.TODOS_REMINDER_MAX_LATENESS
+        position = max(self.checkpoint, (earliest, 0))
+        heap = []
+        while True:
+            rows = list(
+                self.todos.filter(status=Status.OPEN, dueDate__lte=until)
+                .filter(afterCursor(ORDERING, position))
+                .order_by(*ORDERING)
+                .values_list("dueDate", "id")[: self.batchSize]
+            )
+            heap.extend(rows)
+            if len(rows) < self.batchSize:
+                break
+            position = rows[-1]
+        # Rows arrive sorted, which already satisfies the heap invariant.
+        self.heap = heap
+
+    def nextFireTime(self):
+        return self.heap[0][0] - self.lead if self.heap else None
+
+    def fireDue(self, now):
+        due = []
+        while self.heap and self.heap[0][0] - self.lead <= now:
+            due.append(heapq.heappop(self.heap))
+            if len(due) >= self.batchSize:
+                self.send(due)
+                due = []
+        if due:
+            self.send(due)
+
+    def send(self, entries):
+        # Re-check: the to-do may have been completed, rescheduled or deleted
+        # since it was loaded.
+        current = {
+            (todo["dueDate"], todo["id"]): todo
+            for todo in self.todos.filter(
+                id__in=[todoId for _, todoId in entries], status=Status.OPEN
+            ).values("id", "dueDate", "title", "user_id")
+        }
+        # Users may live on another database than their to-dos, so no join.
+        emails = dict(
+            User.objects.filter(
+                pk__in={todo["user_id"] for todo in current.values()}
+            ).values_list("pk", "email")
+        )
+        reminders = [
+            Reminder(
+                todoId=todo["id"],
+                userId=todo["user_id"],
+                email=emails.get(todo["user_id"], ""),
+                title=todo["title"],
+                dueDate=todo["dueDate"],
+            )
+            for todo in (current.get(entry) for entry in entries)
+            if todo is not None
+        ]
+        if reminders:
+            self.sink.send(reminders)
+            self.sent += len(reminders)
+        self.saveCheckpoint(entries[-1])
+
+    def runOnce(self, now=None):
+        now = now or timezone.now()
+        self.refresh(now)
+        self.fireDue(now)
+
+    def runForever(self, poll):
+        poll = timedelta(seconds=poll)
+        nextRefresh = timezone.now()
+        while True:
+            now = timezone.now()
+            if now >= nextRefresh:
+                self.refresh(now)
+                nextRefresh = now + poll
+            self.fireDue(now)
+            wakeUp = min(filter(None, (nextRefresh, self.nextFireTime())))
+            time.sleep(max(0.0, (wakeUp - timezone.now()).total_seconds()))
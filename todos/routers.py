@@ -0,0 +1,152 @@
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .models import User
+from .sharding import currentShard, shardFor
+
+PIN_SESSION_KEY = "_todos_primary_until"
+
+currentRouting = ContextVar("todos_routing", default=None)
+
+
+class ShardRoutingError(Exception):
+    pass
+
+
+class RequestRouting:
+    """Where the queries of one request go; set up by DatabaseRoutingMiddleware."""
+
+    def __init__(self, request):
+        self.request = request
+        replicas = settings.TODOS_READ_REPLICAS
+        self.replica = random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+        self.pinned = None
+        self.wrote = False
+        self.shards = {}
+
+    def shardFor(self, userId):
+        # One lookup per user and request, so a move never splits a request.
+        if userId not in self.shards:
+            self.shards[userId] = shardFor(userId)
+        return self.shards[userId]
+
+    def userShard(self):
+        user = self.request.user
+        if not user.is_authenticated:
+            raise ShardRoutingError("Sharded query in an anonymous request.")
+        return self.shardFor(user.pk)
+
+    def readAlias(self):
+        if self.wrote:
+            return DEFAULT_DB_ALIAS
+        if self.pinned is None:
+            # Checked on the first read only, so requests that never touch
+            # the database never load the session for it.
+            until = self.request.session.get(PIN_SESSION_KEY, 0)
+            self.pinned = until > time.time()
+        return DEFAULT_DB_ALIAS if self.pinned else self.replica
+
+    def pin(self):
+        until = time.time() + settings.TODOS_PRIMARY_STICKY_SECONDS
+        self.request.session[PIN_SESSION_KEY] = until
+
+
+def isSession(model):
+    return model._meta.app_label == "sessions"
+
+
+class ReplicaRouter:
+    """
+    Sends writes to the primary and the reads of a request to its replica,
+    unless the request or its session has recently written. Reads outside a
+    request (management commands, workers), inside a transaction and of
+    sessions always use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = currentRouting.get()
+        if (
+            routing is None
+            or isSession(model)
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return routing.readAlias()
+
+    def db_for_write(self, model, **hints):
+        routing = currentRouting.get()
+        if routing is not None and not isSession(model):
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.TODOS_READ_REPLICAS:
+            return False
+        return None
+
+
+SHARDED_MODELS = {
+    "todomodel",
+    "archivedtodo",
+    "todocounters",
+    "chunkedupload",
+    "todochange",
+    "todosyncstate",
+}
+
+
+def isSharded(model):
+    return model._meta.app_label == "todos" and model._meta.model_name in SHARDED_MODELS
+
+
+def hintedUser(hints):
+    instance = hints.get("instance")
+    if isinstance(instance, User):
+        return instance.pk
+    if instance is not None and getattr(instance, "user_id", None) is not None:
+        return instance.user_id
+    return hints.get("userId")
+
+
+class ShardRouter:
+    """
+    Sends the user-owned models (to-dos, archive, counters, uploads, change
+    log) to the
+    shard of the user they belong to. The user is taken, in order, from the
+    ``instance`` or ``userId`` hint, from ``todos.sharding.useShard()``
+    and from the authenticated user of the current request. Everything
+    else falls through to the next router.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not isSharded(model):
+            return None
+        routing = currentRouting.get()
+        userId = hintedUser(hints)
+        if userId is not None:
+            return routing.shardFor(userId) if routing else shardFor(userId)
+        alias = currentShard.get()
+        if alias is not None:
+            return alias
+        if routing is not None:
+            return routing.userShard()
+        raise ShardRoutingError(
+            f"Cannot tell the shard of a {model.__name__} query; pass a userId "
+            "hint or wrap it in todos.sharding.useShard()."
+        )
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Every database gets the full schema; unused tables stay empty.
+        return None
@@ -0,0 +1,305 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Count
+from django.utils import timezone
+
+from .cache import bumpUserVersion, getCache
+from .counters import refreshCounters
+from .models import (
+    ArchivedTodo,
+    ChunkedUpload,
+    TodoChange,
+    TodoCounters,
+    TodoSyncState,
+    ToDoModel,
+    UserShard,
+)
+from .sync import logChanges, syncState, userSyncState
+
+# Each shard hands out to-do and change log ids from its own range (by its
+# position in TODOS_SHARDS), so rows keep their ids when a user moves
+# between shards.
+ID_RANGE = 1 << 40
+RANGED_MODELS = (ToDoModel, TodoChange)
+
+# Copied on a move in this order and deleted in reverse (uploads point at
+# to-dos). TodoCounters is recounted on the target instead.
+MOVED_MODELS = (ToDoModel, ArchivedTodo, ChunkedUpload, TodoChange)
+
+# Added to a moved user's change log revision on the target shard, so
+# revisions the source still hands out during the move stay below it.
+REVISION_GAP = 1 << 32
+
+currentShard = ContextVar("todos_shard", default=None)
+
+
+@contextmanager
+def useShard(alias):
+    """Route sharded queries that carry no user to ``alias``."""
+    token = currentShard.set(alias)
+    try:
+        yield
+    finally:
+        currentShard.reset(token)
+
+
+def shardAliases():
+    return settings.TODOS_SHARDS or [DEFAULT_DB_ALIAS]
+
+
+def shardKey(userId):
+    return f"todos:shard:{userId}"
+
+
+def storedShard(userId):
+    return (
+        UserShard.objects.using(DEFAULT_DB_ALIAS)
+        .filter(user_id=userId)
+        .values_list("shard", flat=True)
+        .first()
+    ) or DEFAULT_DB_ALIAS
+
+
+def shardFor(userId):
+    """
+    The user's shard, from the cache shared by all processes (see the
+    settings) or else from ``UserShard``.
+    """
+    cache = getCache()
+    alias = cache.get(shardKey(userId))
+    if alias is None:
+        alias = storedShard(userId)
+        # add(), not set(): if setShard() ran since the lookup above, its
+        # entry is newer than ours.
+        cache.add(shardKey(userId), alias, timeout=None)
+    return alias
+
+
+def setShard(userId, alias):
+    UserShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        user_id=userId, defaults={"shard": alias, "updated_at": timezone.now()}
+    )
+    getCache().set(shardKey(userId), alias, timeout=None)
+
+
+def placeUser(userId):
+    """Assign a new user to a shard, round-robin by id."""
+    shards = settings.TODOS_SHARDS
+    setShard(userId, shards[userId % len(shards)])
+
+
+def reserveIdRange(using, **kwargs):
+    """
+    ``post_migrate`` handler: start the id sequences of a shard at the
+    beginning of its range. Leaves a table alone once it has ids in range.
+    """
+    if using not in settings.TODOS_SHARDS:
+        return
+    start = settings.TODOS_SHARDS.index(using) * ID_RANGE
+    if not start:
+        return
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for model in RANGED_MODELS:
+            table = model._meta.db_table
+            quoted = connection.ops.quote_name(table)
+            cursor.execute(f"SELECT MAX(id) FROM {quoted}")
+            if (cursor.fetchone()[0] or 0) >= start:
+                continue
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), %s, false)",
+                    [table, start],
+                )
+            elif connection.vendor == "sqlite":
+                cursor.execute("DELETE FROM sqlite_sequence WHERE name = %s", [table])
+                cursor.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)",
+                    [table, start - 1],
+                )
+
+
+def timestampFields(model):
+    return [
+        f.attname
+        for f in model._meta.concrete_fields
+        if getattr(f, "auto_now", False) or getattr(f, "auto_now_add", False)
+    ]
+
+
+def copyRows(queryset, target, batchSize):
+    """
+    Upsert the rows of ``queryset`` into ``target`` in primary-key order,
+    ``batchSize`` at a time. Returns the primary keys copied.
+    """
+    model = queryset.model
+    pk = model._meta.pk.attname
+    fields = [f for f in model._meta.concrete_fields if f.name != "search_vector"]
+    stamps = timestampFields(model)
+    copied = []
+    while True:
+        batch = queryset.order_by(pk)
+        if copied:
+            batch = batch.filter(pk__gt=copied[-1])
+        rows = list(batch.values(*[f.attname for f in fields])[:batchSize])
+        if not rows:
+            return copied
+        model._base_manager.using(target).bulk_create(
+            [model(**row) for row in rows],
+            update_conflicts=True,
+            unique_fields=[model._meta.pk.name],
+            update_fields=[f.name for f in fields if not f.primary_key],
+        )
+        if stamps:
+            # bulk_create applies auto_now/auto_now_add; put the originals back.
+            model._base_manager.using(target).bulk_update(
+                [model(**{f: row[f] for f in [pk, *stamps]}) for row in rows], stamps
+            )
+        copied.extend(row[pk] for row in rows)
+
+
+def deleteRows(model, using, ids, batchSize=1000):
+    """
+    Delete rows by primary key with plain SQL, so ``post_delete`` handlers
+    do not adjust the counters of the user's new shard.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    ids = list(ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), batchSize):
+            chunk = ids[start : start + batchSize]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {column} IN ({placeholders})",
+                [model._meta.pk.get_db_prep_value(v, connection) for v in chunk],
+            )
+
+
+def userRows(model, using, userId):
+    return model._default_manager.using(using).filter(user_id=userId)
+
+
+def moveUser(userId, target, batchSize=1000, grace=5.0, log=None):
+    """
+    Move a user's to-dos, archive and uploads to ``target`` while the user
+    keeps working:
+
+    1. copy everything from the source shard in batches;
+    2. point the shard map at ``target`` and wait ``grace`` seconds for
+       requests still using the source to finish;
+    3. copy again what changed on the source since step 1 started, and
+       drop rows deleted meanwhile, logging both for sync clients;
+    4. delete the user's rows on the source and recount the counters.
+
+    Writes reaching the source after the grace period are lost, so keep it
+    above the slowest request. Returns the number of to-dos moved.
+    """
+    log = log or (lambda message: None)
+    source = storedShard(userId)
+    if source == target:
+        return 0
+    started = timezone.now()
+    copied = {}
+    for model in MOVED_MODELS:
+        copied[model] = copyRows(userRows(model, source, userId), target, batchSize)
+        log(f"user {userId}: copied {len(copied[model])} {model._meta.db_table} rows")
+
+    revision, prunedThrough = syncState(userId, source)
+    userSyncState(userId, target).update_or_create(
+        user_id=userId,
+        defaults={
+            "revision": revision + REVISION_GAP,
+            "pruned_through": prunedThrough,
+        },
+    )
+    setShard(userId, target)
+    flipped = timezone.now()
+    time.sleep(grace)
+
+    changedSince = {
+        ToDoModel: {"updated_at__gte": started},
+        ArchivedTodo: {"archived_at__gte": started},
+        ChunkedUpload: {},
+        TodoChange: {"created_at__gte": started},
+    }
+    for model in MOVED_MODELS:
+        rows = userRows(model, source, userId)
+        onTarget = userRows(model, target, userId)
+        # Leave alone what the user deleted or edited on the target since
+        # the flip; the target has the newer state.
+        skip = set(copied[model]) - set(onTarget.values_list("pk", flat=True))
+        if model is ToDoModel:
+            edited = onTarget.filter(updated_at__gte=flipped)
+            skip |= set(edited.values_list("pk", flat=True))
+        changed = rows.filter(**changedSince[model]).exclude(pk__in=skip)
+        caughtUp = copyRows(changed, target, batchSize)
+        copied[model] += caughtUp
+        # Drop copies of rows deleted on the source meanwhile; rows created
+        # on the target since the flip were never copied and stay.
+        gone = set(copied[model]) - set(rows.values_list("pk", flat=True))
+        deleteRows(model, target, gone, batchSize)
+        if model is ToDoModel:
+            # Clients may already have synced past these on the target.
+            logChanges(userId, caughtUp, using=target)
+            logChanges(userId, gone, deleted=True, using=target)
+
+    for model in reversed(MOVED_MODELS):
+        ids = userRows(model, source, userId).values_list("pk", flat=True)
+        deleteRows(model, source, ids, batchSize)
+    userRows(TodoCounters, source, userId).delete()
+    userRows(TodoSyncState, source, userId).delete()
+    todos = userRows(ToDoModel, target, userId)
+    todos.updateSearchVector()
+    moved = todos.count()
+    refreshCounters(userId)
+    bumpUserVersion(userId)
+    log(f"user {userId}: moved {moved} to-dos from {source} to {target}")
+    return moved
+
+
+def shardLoads():
+    """Number of to-dos stored on each shard."""
+    return {
+        alias: ToDoModel._base_manager.using(alias).count() for alias in shardAliases()
+    }
+
+
+def planRebalance(tolerance=0.1, maxMoves=10):
+    """
+    Pick ``(userId, source, target, todos)`` moves that bring every shard
+    within ``tolerance`` of the mean load, moving the largest users that
+    fit from the fullest shard to the emptiest one.
+    """
+    loads = shardLoads()
+    mean = sum(loads.values()) / len(loads)
+    moves = []
+    moved = set()
+    while len(moves) < maxMoves:
+        source = max(loads, key=loads.get)
+        target = min(loads, key=loads.get)
+        gap = loads[source] - loads[target]
+        if loads[source] - mean <= tolerance * mean or gap <= 1:
+            break
+        # Never overshoot: the target must not end up fuller than the source.
+        best = (
+            ToDoModel._base_manager.using(source)
+            .exclude(user_id__in=moved)
+            .values("user_id")
+            .annotate(todos=Count("id"))
+            .filter(todos__lte=gap // 2)
+            .order_by("-todos")
+            .first()
+        )
+        if best is None:
+            break
+        moves.append((best["user_id"], source, target, best["todos"]))
+        moved.add(best["user_id"])
+        loads[source] -= best["todos"]
+        loads[target] += best["todos"]
+    return moves
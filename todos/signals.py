@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_out
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from .backends import invalidateUser
+from .cache import bumpUserVersion
+from .counters import invalidateCounters, recordChange, todoState
+from .images import needsVariants, scheduleVariants
+from .models import TodoSyncState, ToDoModel, User
+from .sharding import MOVED_MODELS, deleteRows, placeUser, shardFor, userRows
+from .sync import logChanges
+
+
+@receiver(post_save, sender=ToDoModel)
+@receiver(post_delete, sender=ToDoModel)
+def invalidateTodoCache(sender, instance, **kwargs):
+    bumpUserVersion(instance.user_id)
+
+
+@receiver(post_save, sender=ToDoModel)
+def updateSearchVector(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is not None and not {"title", "description"} & set(update_fields):
+        return
+    ToDoModel.objects.using(using).filter(pk=instance.pk).updateSearchVector()
+
+
+@receiver(post_save, sender=ToDoModel)
+def queueImageVariants(sender, instance, using, **kwargs):
+    if needsVariants(instance):
+        scheduleVariants(instance.pk, using)
+
+
+@receiver(post_init, sender=ToDoModel)
+def rememberCounterState(sender, instance, **kwargs):
+    instance._counterState = todoState(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=ToDoModel)
+def updateCounters(sender, instance, created, **kwargs):
+    new = todoState(instance)
+    old = None if created else instance._counterState
+    if new is None or (old is None and not created):
+        invalidateCounters(instance.user_id)
+    else:
+        recordChange(old, new)
+    instance._counterState = new
+
+
+@receiver(post_delete, sender=ToDoModel)
+def removeFromCounters(sender, instance, **kwargs):
+    state = instance._counterState or todoState(instance)
+    if state is None:
+        invalidateCounters(instance.user_id)
+    else:
+        recordChange(state, None)
+
+
+@receiver(post_save, sender=ToDoModel)
+def logTodoSave(sender, instance, using, **kwargs):
+    logChanges(instance.user_id, [instance.pk], using=using)
+
+
+@receiver(post_delete, sender=ToDoModel)
+def logTodoDelete(sender, instance, using, origin=None, **kwargs):
+    # The log of a deleted user goes with it.
+    if not isinstance(origin, User):
+        logChanges(instance.user_id, [instance.pk], deleted=True, using=using)
+
+
+@receiver(post_save, sender=User)
+def invalidateUserCache(sender, instance, **kwargs):
+    bumpUserVersion(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def assignShard(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and settings.TODOS_SHARDS:
+        placeUser(instance.pk)
+
+
+@receiver(pre_delete, sender=User)
+def deleteShardedData(sender, instance, **kwargs):
+    # The delete cascades on the global database only; the rows on another
+    # shard have to be removed by hand.
+    alias = shardFor(instance.pk) if settings.TODOS_SHARDS else DEFAULT_DB_ALIAS
+    if alias == DEFAULT_DB_ALIAS:
+        return
+    for model in reversed(MOVED_MODELS):
+        ids = userRows(model, alias, instance.pk).values_list("pk", flat=True)
+        deleteRows(model, alias, ids)
+    userRows(TodoSyncState, alias, instance.pk).delete()
+    invalidateCounters(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidateCachedUser(sender, instance, **kwargs):
+    invalidateUser(instance.pk)
+
+
+@receiver(user_logged_out)
+def forgetLoggedOutUser(sender, request, user, **kwargs):
+    if user is not None:
+        invalidateUser(user.pk)
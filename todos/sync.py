@@ -0,0 +1,181 @@
+from django.db import IntegrityError, router, transaction
+from django.db.models import F, Max
+
+from .broker import publishChange
+from .counters import userTodos
+from .models import TodoChange, TodoSyncState
+from .pagination import decodeCursor, encodeCursor
+
+# A sync cursor is (revision, id): the client has every change up to
+# ``revision``, and while the initial snapshot is still being paged, every
+# to-do up to ``id``. Once the snapshot is done ``id`` is None.
+CURSOR_FIELDS = ("revision", "id")
+
+
+class ResyncRequired(Exception):
+    """The changes after a cursor have been pruned from the log."""
+
+
+def userChanges(userId, using=None):
+    manager = TodoChange.objects.db_manager(using, hints={"userId": userId})
+    return manager.filter(user_id=userId)
+
+
+def userSyncState(userId, using=None):
+    manager = TodoSyncState.objects.db_manager(using, hints={"userId": userId})
+    return manager.filter(user_id=userId)
+
+
+def allocateRevisions(userId, count, using):
+    """
+    Reserve the user's next ``count`` revisions. The state row stays locked
+    until the surrounding transaction commits, so revisions become visible
+    in increasing order and a cursor never skips a change committed late.
+    """
+    state = userSyncState(userId, using)
+    if not state.update(revision=F("revision") + count):
+        try:
+            with transaction.atomic(using=using):
+                state.create(user_id=userId, revision=count)
+            return range(1, count + 1)
+        except IntegrityError:
+            # Created concurrently.
+            state.update(revision=F("revision") + count)
+    last = state.values_list("revision", flat=True).get()
+    return range(last - count + 1, last + 1)
+
+
+def logChanges(userId, todoIds, deleted=False, using=None):
+    """
+    Append an entry (or tombstones, with ``deleted``) for each to-do, and
+    wake the user's event streams once the transaction commits.
+    """
+    todoIds = list(todoIds)
+    if not todoIds:
+        return
+    using = using or router.db_for_write(TodoChange, userId=userId)
+    with transaction.atomic(using=using):
+        revisions = allocateRevisions(userId, len(todoIds), using)
+        TodoChange.objects.using(using).bulk_create(
+            [
+                TodoChange(
+                    user_id=userId, todo_id=todoId, revision=revision, deleted=deleted
+                )
+                for todoId, revision in zip(todoIds, revisions)
+            ]
+        )
+        transaction.on_commit(lambda: publishChange(userId), using=using)
+
+
+def syncState(userId, using=None):
+    """The user's current revision and the last pruned one."""
+    state = (
+        userSyncState(userId, using).values_list("revision", "pruned_through").first()
+    )
+    return state or (0, 0)
+
+
+def encodeSyncCursor(revision, afterId=None):
+    return encodeCursor({"revision": revision, "id": afterId}, CURSOR_FIELDS)
+
+
+def decodeSyncCursor(cursor):
+    revision, afterId = decodeCursor(cursor, CURSOR_FIELDS, nullable=("id",))
+    return revision, afterId
+
+
+def snapshotPage(userId, revision, afterId, pageSize):
+    todos = list(
+        userTodos(userId)
+        .filter(user_id=userId, id__gt=afterId)
+        .order_by("id")[: pageSize + 1]
+    )
+    if len(todos) > pageSize:
+        todos = todos[:pageSize]
+        return [(todo.pk, todo) for todo in todos], revision, todos[-1].pk, True
+    # Snapshot done; carry on with what changed while it was taken.
+    more = userChanges(userId).filter(revision__gt=revision).exists()
+    return [(todo.pk, todo) for todo in todos], revision, None, more
+
+
+def deltaPage(userId, revision, pageSize):
+    entries = list(
+        userChanges(userId)
+        .filter(revision__gt=revision)
+        .order_by("revision")
+        .values_list("revision", "todo_id", "deleted")[: pageSize + 1]
+    )
+    more = len(entries) > pageSize
+    entries = entries[:pageSize]
+    # Only the last entry of each to-do in the page matters; order the
+    # results by it.
+    latest = {}
+    for _, todoId, deleted in entries:
+        latest.pop(todoId, None)
+        latest[todoId] = deleted
+    todos = userTodos(userId).filter(
+        user_id=userId,
+        id__in=[todoId for todoId, deleted in latest.items() if not deleted],
+    )
+    todos = {todo.pk: todo for todo in todos}
+    # A to-do deleted after this page's entry is reported as deleted now;
+    # its tombstone follows on a later page.
+    changes = [
+        (todoId, None if deleted else todos.get(todoId))
+        for todoId, deleted in latest.items()
+    ]
+    return changes, entries[-1][0] if entries else revision, None, more
+
+
+def syncPage(userId, cursor=None, pageSize=500):
+    """
+    One page of changes to the user's to-dos after ``cursor``, as
+    ``(changes, nextCursor, more)``. ``changes`` holds ``(id, todo)``
+    pairs with the to-do's current state, or ``None`` for a deletion.
+
+    Without a cursor the client gets a snapshot of every to-do first, in id
+    order, followed by the changes made since the snapshot began. Raises
+    ``ResyncRequired`` when the log no longer reaches back to the cursor.
+    """
+    revision, prunedThrough = syncState(userId)
+    if cursor is None:
+        afterId = 0
+    else:
+        revision, afterId = decodeSyncCursor(cursor)
+        if revision < prunedThrough:
+            raise ResyncRequired("The change log has been pruned past this cursor.")
+
+    if afterId is not None:
+        changes, revision, afterId, more = snapshotPage(
+            userId, revision, afterId, pageSize
+        )
+    else:
+        changes, revision, afterId, more = deltaPage(userId, revision, pageSize)
+    return changes, encodeSyncCursor(revision, afterId), more
+
+
+def pruneChanges(using, before, batchSize=1000):
+    """
+    Delete log entries on ``using`` created before ``before``, recording
+    per user how far the log was pruned. Returns the number deleted.
+    """
+    pruned = 0
+    while True:
+        with transaction.atomic(using=using):
+            rows = list(
+                TodoChange.objects.using(using)
+                .filter(created_at__lt=before)
+                .order_by("id")
+                .values_list("id", flat=True)[:batchSize]
+            )
+            if not rows:
+                return pruned
+            batch = TodoChange.objects.using(using).filter(id__in=rows)
+            horizons = batch.values("user_id").annotate(through=Max("revision"))
+            for horizon in horizons:
+                TodoSyncState.objects.using(using).filter(
+                    user_id=horizon["user_id"],
+                    pruned_through__lt=horizon["through"],
+                ).update(pruned_through=horizon["through"])
+            batch.delete()
+        pruned += len(rows)
@@ -1,3 +1,1020 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .cache import cacheStats, getCache
+from .counters import getCounters, userTodos
+from .events import EventStreamApp
+from .importer import parseCsv, runImport
+from .models import (
+    Priority,
+    Status,
+    TodoChange,
+    TodoCounters,
+    ToDoModel,
+    User,
+    UserShard,
+)
+from .routers import PIN_SESSION_KEY, ShardRoutingError
+from .sync import encodeSyncCursor, pruneChanges, syncState
+from .sharding import ID_RANGE, moveUser, reserveIdRange, setShard, shardFor, useShard
+
+REPLICA = "replica1"
+SHARD = "shard1"
+
+
+def todoForm(title):
+    return {
+        "title": title,
+        "description": "test",
+        "priority": Priority.MEDIUM,
+        "status": Status.OPEN,
+        "dueDate": (timezone.now() + timedelta(days=1)).strftime("%Y-%m-%d %H:%M"),
+    }
+
+
+def todoQueries(captured):
+    return [q["sql"] for q in captured if "todos_todomodel" in q["sql"]]
+
+
+def createTodo(user, title="todo", **fields):
+    fields.setdefault("dueDate", timezone.now() + timedelta(days=1))
+    return userTodos(user.pk).create(
+        title=title, description="test", user=user, **fields
+    )
+
+
+def userOn(alias, name):
+    user = User.objects.create_user(name, f"{name}@example.com", "pw")
+    setShard(user.pk, alias)
+    return user
+
+
+def rawCursor(values):
+    """A cursor as a client could forge it."""
+    raw = json.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+@override_settings(TODOS_PAGE_SIZE=2)
+class KeysetPaginationTests(TestCase):
+    databases = {"default", SHARD}
+
+    def setUp(self):
+        getCache().clear()
+        self.user = userOn("default", "pager")
+        self.client.force_login(self.user)
+        now = timezone.now()
+        self.todos = [
+            createTodo(self.user, f"todo {n}", dueDate=now + timedelta(days=n % 3))
+            for n in range(5)
+        ]
+
+    def pages(self, **params):
+        titles, cursor = [], None
+        while True:
+            query = dict(params, **({"cursor": cursor} if cursor else {}))
+            response = self.client.get(reverse("apiListTodos"), query)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertLessEqual(len(body["results"]), 2)
+            titles += [todo["title"] for todo in body["results"]]
+            cursor = body["next"]
+            if cursor is None:
+                return titles
+
+    def test_pages_follow_the_sort_order(self):
+        expected = [
+            todo.title for todo in sorted(self.todos, key=lambda t: (t.dueDate, t.pk))
+        ]
+        self.assertEqual(self.pages(), expected)
+        self.assertEqual(self.pages(sort="-dueDate"), expected[::-1])
+
+    def test_pages_survive_inserts_before_the_cursor(self):
+        response = self.client.get(reverse("apiListTodos"))
+        first, cursor = response.json()["results"], response.json()["next"]
+        createTodo(self.user, "earlier", dueDate=timezone.now() - timedelta(days=9))
+
+        rest = self.client.get(reverse("apiListTodos"), {"cursor": cursor}).json()
+        seen = [todo["id"] for todo in first + rest["results"]]
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_tampered_cursors_are_rejected(self):
+        due = self.todos[0].dueDate.isoformat()
+        first = min(self.todos, key=lambda t: (t.dueDate, t.pk)).title
+        tampered = [
+            "not base64!",
+            rawCursor([due, "abc"]),
+            rawCursor([due, True]),
+            rawCursor([due, {"id": 1}]),
+            rawCursor([due, 2**70]),
+            rawCursor(["2024-01-01T00:00:00", 1]),
+            rawCursor([12, 1]),
+            rawCursor([due]),
+        ]
+        for cursor in tampered:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse("apiListTodos"), {"cursor": cursor})
+                self.assertEqual(response.status_code, 400)
+                # The list page falls back to the first page.
+                response = self.client.get(reverse("viewAll"), {"cursor": cursor})
+                self.assertContains(response, first)
+
+
+class BatchApiTests(TestCase):
+    databases = {"default", SHARD}
+
+    def setUp(self):
+        getCache().clear()
+        self.user = userOn("default", "batcher")
+        self.client.force_login(self.user)
+        self.todos = [createTodo(self.user, f"todo {n}") for n in range(2)]
+
+    def batch(self, body):
+        return self.client.post(
+            reverse("apiBatchTodos"), json.dumps(body), content_type="application/json"
+        )
+
+    def test_every_item_gets_a_result(self):
+        due = (timezone.now() + timedelta(days=2)).isoformat()
+        other = createTodo(userOn("default", "other"), "not mine")
+        response = self.batch(
+            {
+                "create": [
+                    {"title": "new", "description": "d", "dueDate": due},
+                    {"title": "no due date", "description": "d"},
+                ],
+                "update": [
+                    {"id": self.todos[0].pk, "title": "renamed"},
+                    {"id": other.pk, "title": "stolen"},
+                ],
+                "delete": [self.todos[1].pk, other.pk, "x"],
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([r["ok"] for r in body["create"]], [True, False])
+        self.assertEqual(body["create"][0]["todo"]["title"], "new")
+        self.assertIn("dueDate", body["create"][1]["errors"])
+        self.assertEqual([r["ok"] for r in body["update"]], [True, False])
+        self.assertEqual(body["update"][0]["todo"]["title"], "renamed")
+        self.assertEqual([r["ok"] for r in body["delete"]], [True, False, False])
+
+        titles = set(
+            userTodos(self.user.pk)
+            .filter(user=self.user)
+            .values_list("title", flat=True)
+        )
+        self.assertEqual(titles, {"renamed", "new"})
+        self.assertEqual(userTodos(other.user_id).get(pk=other.pk).title, "not mine")
+
+    def test_batch_is_one_transaction(self):
+        due = (timezone.now() + timedelta(days=2)).isoformat()
+        with mock.patch("todos.api.logChanges", side_effect=DatabaseError("boom")):
+            with self.assertRaises(DatabaseError):
+                self.batch(
+                    {
+                        "create": [
+                            {"title": "new", "description": "d", "dueDate": due}
+                        ],
+                        "update": [{"id": self.todos[0].pk, "title": "renamed"}],
+                        "delete": [self.todos[1].pk],
+                    }
+                )
+
+        titles = set(
+            userTodos(self.user.pk)
+            .filter(user=self.user)
+            .values_list("title", flat=True)
+        )
+        self.assertEqual(titles, {"todo 0", "todo 1"})
+
+    def test_batch_size_is_limited(self):
+        with self.settings(TODOS_API_MAX_BATCH=2):
+            response = self.batch({"delete": [1, 2, 3]})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(TODOS_CACHE_SHARED=True)
+class PageCacheTests(TestCase):
+    databases = {"default", SHARD}
+
+    def setUp(self):
+        getCache().clear()
+        self.user = userOn("default", "cached")
+        self.client.force_login(self.user)
+        self.todo = createTodo(self.user, "before")
+        self.url = reverse("viewOne", args=[self.todo.pk])
+
+    def test_repeated_views_are_served_from_the_cache(self):
+        self.assertContains(self.client.get(self.url), "before")
+        hits = cacheStats()["hits"]
+        self.assertContains(self.client.get(self.url), "before")
+        self.assertEqual(cacheStats()["hits"], hits + 1)
+
+    def test_saves_invalidate_the_page(self):
+        self.assertContains(self.client.get(self.url), "before")
+        self.todo.title = "after save"
+        self.todo.save()
+        self.assertContains(self.client.get(self.url), "after save")
+
+    def test_bulk_writes_invalidate_the_page(self):
+        # The batch API writes with bulk_update, which sends no signals.
+        self.assertContains(self.client.get(self.url), "before")
+        self.client.post(
+            reverse("apiBatchTodos"),
+            json.dumps({"update": [{"id": self.todo.pk, "title": "after batch"}]}),
+            content_type="application/json",
+        )
+        self.assertContains(self.client.get(self.url), "after batch")
+
+    def test_pages_are_per_user(self):
+        self.client.get(self.url)
+        self.client.force_login(userOn("default", "intruder"))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class ExportTests(TransactionTestCase):
+    # The ASGI export reads its rows from another thread. Outside a test
+    # transaction requests read from the replica (a mirror of "default").
+    databases = {"default", REPLICA, SHARD}
+
+    def setUp(self):
+        getCache().clear()
+        self.user = userOn(SHARD, "exporter")
+        self.client.force_login(self.user)
+        now = timezone.now()
+        self.todos = [
+            createTodo(
+                self.user, "second, with a comma", dueDate=now + timedelta(days=2)
+            ),
+            createTodo(self.user, "first", dueDate=now + timedelta(days=1)),
+        ]
+        createTodo(userOn(SHARD, "other"), "not mine")
+
+    def export(self, exportFormat):
+        response = self.client.get(reverse("exportTodos"), {"format": exportFormat})
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.export("csv"))))
+        self.assertEqual(
+            [row["title"] for row in rows], ["first", "second, with a comma"]
+        )
+        self.assertEqual(rows[0]["id"], str(self.todos[1].pk))
+        self.assertEqual(rows[0]["dueDate"], self.todos[1].dueDate.isoformat())
+
+    def test_ndjson(self):
+        rows = [json.loads(line) for line in self.export("ndjson").splitlines()]
+        self.assertEqual(
+            [row["title"] for row in rows], ["first", "second, with a comma"]
+        )
+        self.assertEqual(rows[1]["priority"], Priority.MEDIUM)
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse("exportTodos"), {"format": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_asgi_streams_asynchronously(self):
+        client = AsyncClient()
+        client.cookies = self.client.cookies
+        response = await client.get(reverse("exportTodos"), {"format": "ndjson"})
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        titles = [json.loads(line)["title"] for line in content.splitlines()]
+        self.assertEqual(titles, ["first", "second, with a comma"])
+
+
+IMPORT_CSV = (
+    "title,description,dueDate,priority\n"
+    "one,d,2030-01-01T10:00:00+00:00,high\n"
+    "bad date,d,tomorrow,low\n"
+    "two,d,2030-01-02T10:00:00+00:00,\n"
+    "no title,,2030-01-03T10:00:00+00:00,low\n"
+    "three,d,2030-01-04T10:00:00+00:00,low\n"
+)
+
+
+class ImportTests(TestCase):
+    databases = {"default", SHARD}
+
+    def setUp(self):
+        getCache().clear()
+        self.user = userOn(SHARD, "importer")
+
+    def runImport(self, **options):
+        rows = parseCsv(io.StringIO(IMPORT_CSV))
+        return runImport(self.user, rows, batchSize=2, **options)
+
+    def test_valid_rows_are_imported_and_logged(self):
+        report = self.runImport()
+
+        self.assertEqual((report.created, report.failed), (3, 2))
+        todos = userTodos(self.user.pk).filter(user=self.user).order_by("dueDate")
+        self.assertEqual(
+            list(todos.values_list("title", "priority")),
+            [("one", Priority.HIGH), ("two", Priority.MEDIUM), ("three", Priority.LOW)],
+        )
+        logged = TodoChange.objects.using(SHARD).values_list("todo_id", flat=True)
+        self.assertEqual(sorted(logged), sorted(todo.pk for todo in todos))
+        self.assertEqual(getCounters(self.user.pk).open, 3)
+
+    def test_errors_name_their_line(self):
+        report = self.runImport()
+        self.assertEqual([error["line"] for error in report.errors], [3, 5])
+        self.assertIn("dueDate", report.errors[0]["errors"])
+        self.assertIn("description", report.errors[1]["errors"])
+
+    def test_reported_errors_are_capped(self):
+        errorFile = io.StringIO()
+        report = self.runImport(maxErrors=1, errorFile=errorFile)
+
+        self.assertEqual(report.failed, 2)
+        self.assertEqual([error["line"] for error in report.errors], [3])
+        written = [json.loads(line) for line in errorFile.getvalue().splitlines()]
+        self.assertEqual([error["line"] for error in written], [3, 5])
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "todos.csv")
+            with open(path, "w") as f:
+                f.write(IMPORT_CSV)
+            errors = os.path.join(directory, "errors.ndjson")
+            call_command(
+                "importtodos", "importer", path, errors=errors, stdout=io.StringIO()
+            )
+            with open(errors) as f:
+                self.assertEqual(len(f.readlines()), 2)
+        self.assertEqual(userTodos(self.user.pk).filter(user=self.user).count(), 3)
+
+    def test_view(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile("todos.csv", IMPORT_CSV.encode("utf-8-sig"))
+        with self.settings(TODOS_IMPORT_MAX_REPORTED_ERRORS=1):
+            response = self.client.post(
+                reverse("importTodos"), {"format": "csv", "file": upload}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["report"].created, 3)
+        self.assertEqual(len(response.context["errors"]), 1)
+
+
+class MediaRootMixin:
+    """Keeps the test's media files and upload parts in a temporary directory."""
+
+    def useTemporaryMedia(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        override = self.settings(
+            MEDIA_ROOT=root, TODOS_UPLOAD_TEMP_DIR=os.path.join(root, "parts")
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class ChunkedUploadTests(MediaRootMixin, TestCase):
+    databases = {"default", SHARD}
+
+    def setUp(self):
+        getCache().clear()
+        self.useTemporaryMedia()
+        self.user = userOn("default", "uploader")
+        self.client.force_login(self.user)
+        self.todo = createTodo(self.user)
+        response = self.client.post(
+            reverse("apiCreateUpload"),
+            json.dumps({"todo": self.todo.pk, "filename": "notes.txt", "size": 10}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.upload = response.json()["id"]
+
+    def put(self, data, start):
+        end = start + len(data) - 1
+        return self.client.put(
+            reverse("apiUploadDetail", args=[self.upload]),
+            data,
+            content_type="application/octet-stream",
+            headers={"Content-Range": f"bytes {start}-{end}/10"},
+        )
+
+    def finalize(self):
+        return self.client.post(reverse("apiFinalizeUpload", args=[self.upload]))
+
+    def test_chunks_are_appended_and_finalized(self):
+        self.assertEqual(self.put(b"0123", 0).json()["offset"], 4)
+        self.assertEqual(self.put(b"456789", 4).json()["offset"], 10)
+
+        response = self.finalize()
+        self.assertEqual(response.status_code, 200)
+        self.todo.refresh_from_db()
+        with self.todo.file.open("rb") as f:
+            self.assertEqual(f.read(), b"0123456789")
+        self.assertEqual(self.finalize().status_code, 409)
+
+    def test_chunk_at_the_wrong_offset_conflicts(self):
+        self.put(b"0123", 0)
+        response = self.put(b"0123", 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["offset"], 4)
+        self.assertEqual(self.put(b"89", 8).status_code, 409)
+
+        # The client resumes from the offset the upload reports.
+        offset = self.client.get(reverse("apiUploadDetail", args=[self.upload]))
+        self.assertEqual(self.put(b"456789", offset.json()["offset"]).status_code, 200)
+
+    def test_incomplete_upload_cannot_be_finalized(self):
+        self.put(b"0123", 0)
+        response = self.finalize()
+        self.assertEqual(response.status_code, 409)
+        self.todo.refresh_from_db()
+        self.assertFalse(self.todo.file)
+
+    def test_uploads_are_private(self):
+        self.client.force_login(userOn("default", "other"))
+        self.assertEqual(self.put(b"0123", 0).status_code, 404)
+
+
+class MediaTests(MediaRootMixin, TestCase):
+    databases = {"default", SHARD}
+
+    def setUp(self):
+        getCache().clear()
+        self.useTemporaryMedia()
+        self.user = userOn("default", "owner")
+        self.client.force_login(self.user)
+        self.todo = createTodo(self.user)
+        self.url = self.attach("notes.txt")
+
+    def attach(self, name):
+        self.todo.file.save(name, ContentFile(b"0123456789"))
+        return settings.MEDIA_URL + self.todo.file.name
+
+    def get(self, url=None, **headers):
+        return self.client.get(
+            url or self.url,
+            headers={k.replace("_", "-"): v for k, v in headers.items()},
+        )
+
+    def test_whole_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_range(self):
+        response = self.get(Range="bytes=2-4")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"234")
+        self.assertEqual(response["Content-Range"], "bytes 2-4/10")
+
+        response = self.get(Range="bytes=-3")
+        self.assertEqual(b"".join(response.streaming_content), b"789")
+
+    def test_unsatisfiable_range(self):
+        response = self.get(Range="bytes=10-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_stale_if_range_gets_the_whole_file(self):
+        response = self.get(Range="bytes=2-4", If_Range='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified(self):
+        etag = self.get()["ETag"]
+        self.assertEqual(self.get(If_None_Match=etag).status_code, 304)
+
+    def test_other_users_get_a_404(self):
+        self.client.force_login(userOn("default", "other"))
+        self.assertEqual(self.get().status_code, 404)
+
+    def test_offload_quotes_the_name(self):
+        url = self.attach("notes-ü.txt")
+        with self.settings(TODOS_MEDIA_OFFLOAD="x-accel-redirect"):
+            response = self.get(url)
+        name = self.todo.file.name.replace("ü", "%C3%BC")
+        self.assertEqual(
+            response["X-Accel-Redirect"], settings.TODOS_MEDIA_ACCEL_PREFIX + name
+        )
+
+    async def test_asgi_range(self):
+        self.async_client.cookies = self.client.cookies
+        response = await self.async_client.get(self.url, headers={"Range": "bytes=2-4"})
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(content, b"234")
+
+
+class PriorityBackfillTests(TransactionTestCase):
+    before = [("todos", "0007_todomodel_priority_level")]
+    after = [("todos", "0009_todomodel_priority_status")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps.get_model(
+            "todos", "ToDoModel"
+        )
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_priorities_are_converted_both_ways(self):
+        user = User.objects.create_user("old", "old@example.com", "pw")
+        # Historical models know nothing of the shards.
+        with useShard("default"):
+            OldTodo = self.migrate(self.before)
+            priorities = [" High", "low", "URGENT", "whatever", "2", None]
+            for n, priority in enumerate(priorities):
+                OldTodo.objects.create(
+                    # Sparse ids, as on a shard.
+                    id=ID_RANGE + n * 7,
+                    title=f"todo {n}",
+                    description="d",
+                    dueDate=timezone.now(),
+                    priority=priority,
+                    user_id=user.pk,
+                )
+
+            backfill = import_module(
+                "todos.migrations.0008_todomodel_priority_backfill"
+            )
+            with mock.patch.object(backfill, "BATCH_SIZE", 4):
+                NewTodo = self.migrate(self.after)
+            self.assertEqual(
+                list(NewTodo.objects.order_by("id").values_list("priority", "status")),
+                [(3, 0), (1, 0), (3, 0), (2, 0), (2, 0), (2, 0)],
+            )
+
+            OldTodo = self.migrate(self.before)
+            self.assertEqual(
+                list(OldTodo.objects.order_by("id").values_list("priority", flat=True)),
+                ["high", "low", "high", "medium", "medium", "medium"],
+            )
+
+
+@override_settings(
+    TODOS_THROTTLE_ENABLED=True,
+    TODOS_THROTTLE_ACCOUNT_BURST=2,
+    TODOS_THROTTLE_ACCOUNT_PER_MINUTE=1,
+    TODOS_THROTTLE_IP_BURST=3,
+    TODOS_THROTTLE_IP_PER_MINUTE=1,
+)
+class ThrottleTests(TestCase):
+    databases = {"default", SHARD}
+
+    def setUp(self):
+        getCache().clear()
+        User.objects.create_user("target", "target@example.com", "pw")
+
+    def login(self, username, ip="10.0.0.1"):
+        return self.client.post(
+            reverse("loginUser"),
+            {"username": username, "password": "wrong"},
+            REMOTE_ADDR=ip,
+        )
+
+    def test_account_is_throttled(self):
+        for _ in range(2):
+            self.assertEqual(self.login("target").status_code, 200)
+        response = self.login("target", ip="10.0.0.2")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    def test_ip_is_throttled(self):
+        for name in ("a", "b", "c"):
+            self.assertEqual(self.login(name).status_code, 200)
+        self.assertEqual(self.login("d").status_code, 429)
+        self.assertEqual(self.login("d", ip="10.0.0.2").status_code, 200)
+
+    def test_throttled_attempts_do_not_hash(self):
+        for _ in range(2):
+            self.login("target")
+        with mock.patch("todos.views.authenticate") as authenticate:
+            self.assertEqual(self.login("target").status_code, 429)
+        authenticate.assert_not_called()
+
+
+@override_settings(
+    TODOS_READ_REPLICAS=[REPLICA],
+    DATABASE_ROUTERS=["todos.routers.ReplicaRouter"],
+    TODOS_PRIMARY_STICKY_SECONDS=10,
+    TODOS_CACHE_SHARED=False,
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    # Run with TodoList2.test_settings, which configures the replica; under
+    # test it mirrors "default", so both see the same rows. Reads inside a
+    # transaction stay on the primary, hence no TestCase.
+    databases = {"default", REPLICA}
+
+    def setUp(self):
+        getCache().clear()
+        self.user = User.objects.create_user("reader", "reader@example.com", "pw")
+        self.client.force_login(self.user)
+        ToDoModel.objects.create(
+            title="seeded", description="d", dueDate=timezone.now(), user=self.user
+        )
+        # The first page view would create the counters row, and that write
+        # pins the session.
+        getCounters(self.user.pk)
+
+    def viewAll(self):
+        """The to-do queries of one list page, per database."""
+        with CaptureQueriesContext(connections["default"]) as primary:
+            with CaptureQueriesContext(connections[REPLICA]) as replica:
+                response = self.client.get(reverse("viewAll"))
+        self.assertEqual(response.status_code, 200)
+        return todoQueries(primary), todoQueries(replica)
+
+    def test_reads_go_to_the_replica(self):
+        primary, replica = self.viewAll()
+        self.assertEqual(primary, [])
+        self.assertNotEqual(replica, [])
+
+    def test_read_after_write_goes_to_the_primary(self):
+        response = self.client.post(reverse("createTodos"), todoForm("written"))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(PIN_SESSION_KEY, self.client.session)
+
+        primary, replica = self.viewAll()
+        self.assertNotEqual(primary, [])
+        self.assertEqual(replica, [])
+
+    def test_pin_expires(self):
+        self.client.post(reverse("createTodos"), todoForm("written"))
+        pinnedUntil = self.client.session[PIN_SESSION_KEY]
+
+        with mock.patch("todos.routers.time.time", return_value=pinnedUntil - 1):
+            primary, replica = self.viewAll()
+        self.assertNotEqual(primary, [])
+
+        with mock.patch("todos.routers.time.time", return_value=pinnedUntil + 1):
+            primary, replica = self.viewAll()
+        self.assertEqual(primary, [])
+        self.assertNotEqual(replica, [])
+
+    def test_pin_is_per_session(self):
+        self.client.post(reverse("createTodos"), todoForm("written"))
+        self.client.logout()
+        self.client.force_login(self.user)
+
+        primary, replica = self.viewAll()
+        self.assertEqual(primary, [])
+        self.assertNotEqual(replica, [])
+
+
+class ShardRoutingTests(TestCase):
+    # Run with TodoList2.test_settings, which configures the shard.
+    databases = {"default", SHARD}
+
+    def setUp(self):
+        # User ids are reused once a test rolls back; so would be their
+        # cached shards.
+        getCache().clear()
+
+    def test_new_users_are_spread_over_the_shards(self):
+        users = [
+            User.objects.create_user(f"user{n}", f"user{n}@example.com", "pw")
+            for n in range(2)
+        ]
+        shards = {shardFor(user.pk) for user in users}
+        self.assertEqual(shards, {"default", SHARD})
+        self.assertEqual(UserShard.objects.filter(user__in=users).count(), 2)
+
+    def test_shard_map_falls_back_to_the_database(self):
+        user = userOn(SHARD, "mapped")
+        getCache().clear()
+        self.assertEqual(shardFor(user.pk), SHARD)
+
+    def test_todos_are_stored_on_the_users_shard(self):
+        sharded = userOn(SHARD, "sharded")
+        unsharded = userOn("default", "unsharded")
+        todo = createTodo(sharded)
+        createTodo(unsharded)
+
+        onShard = ToDoModel.objects.using(SHARD)
+        self.assertEqual(list(onShard.values_list("id", flat=True)), [todo.pk])
+        self.assertFalse(
+            ToDoModel.objects.using("default").filter(user=sharded).exists()
+        )
+        self.assertEqual(userTodos(sharded.pk).filter(user=sharded).count(), 1)
+        self.assertEqual(getCounters(sharded.pk).open, 1)
+        self.assertTrue(TodoCounters.objects.using(SHARD).filter(user=sharded).exists())
+
+    def test_queries_without_a_user_need_a_shard(self):
+        with self.assertRaises(ShardRoutingError):
+            ToDoModel.objects.count()
+        createTodo(userOn(SHARD, "sharded"))
+        with useShard(SHARD):
+            self.assertEqual(ToDoModel.objects.count(), 1)
+
+    def test_each_shard_hands_out_ids_from_its_range(self):
+        onDefault = createTodo(userOn("default", "unsharded"))
+        onShard = createTodo(userOn(SHARD, "sharded"))
+        self.assertLess(onDefault.pk, ID_RANGE)
+        self.assertGreaterEqual(onShard.pk, ID_RANGE)
+        self.assertLess(onShard.pk, 2 * ID_RANGE)
+
+        # Running migrate again leaves a range that is in use alone.
+        reserveIdRange(using=SHARD)
+        self.assertEqual(createTodo(onShard.user).pk, onShard.pk + 1)
+
+    def test_views_use_the_users_shard(self):
+        user = userOn(SHARD, "viewer")
+        self.client.force_login(user)
+        response = self.client.post(reverse("createTodos"), todoForm("sharded"))
+        self.assertEqual(response.status_code, 302)
+
+        todo = ToDoModel.objects.using(SHARD).get(title="sharded")
+        self.assertContains(self.client.get(reverse("viewAll")), "sharded")
+        self.assertEqual(
+            self.client.get(reverse("viewOne", args=[todo.pk])).status_code, 200
+        )
+
+        self.client.force_login(userOn("default", "other"))
+        self.assertEqual(
+            self.client.get(reverse("viewOne", args=[todo.pk])).status_code, 404
+        )
+
+
+class MoveUserTests(TestCase):
+    databases = {"default", SHARD}
+
+    def setUp(self):
+        getCache().clear()
+        self.user = userOn("default", "mover")
+        self.todos = [createTodo(self.user, f"todo {n}") for n in range(3)]
+
+    def test_move_copies_and_removes_the_rows(self):
+        moved = moveUser(self.user.pk, SHARD, batchSize=2, grace=0)
+
+        self.assertEqual(moved, 3)
+        self.assertEqual(shardFor(self.user.pk), SHARD)
+        self.assertEqual(
+            sorted(ToDoModel.objects.using(SHARD).values_list("id", flat=True)),
+            [todo.pk for todo in self.todos],
+        )
+        self.assertFalse(ToDoModel.objects.using("default").exists())
+        self.assertFalse(TodoCounters.objects.using("default").exists())
+        self.assertEqual(TodoCounters.objects.using(SHARD).get().open, 3)
+
+    def test_writes_to_the_source_during_the_move_are_kept(self):
+        def writeToSource(seconds):
+            # A request that looked up the shard before the switch.
+            source = ToDoModel.objects.using("default")
+            source.create(
+                title="late", description="d", dueDate=timezone.now(), user=self.user
+            )
+            source.filter(pk=self.todos[0].pk).update(
+                title="edited", updated_at=timezone.now()
+            )
+            source.filter(pk=self.todos[1].pk).delete()
+
+        with mock.patch("todos.sharding.time.sleep", side_effect=writeToSource):
+            moveUser(self.user.pk, SHARD, grace=1)
+
+        titles = set(ToDoModel.objects.using(SHARD).values_list("title", flat=True))
+        self.assertEqual(titles, {"edited", "todo 2", "late"})
+        self.assertFalse(ToDoModel.objects.using("default").exists())
+
+    def test_edits_on_the_target_win(self):
+        def editBoth(seconds):
+            ToDoModel.objects.using("default").filter(pk=self.todos[0].pk).update(
+                title="stale", updated_at=timezone.now()
+            )
+            target = userTodos(self.user.pk).get(pk=self.todos[0].pk)
+            target.title = "fresh"
+            target.save()
+
+        with mock.patch("todos.sharding.time.sleep", side_effect=editBoth):
+            moveUser(self.user.pk, SHARD, grace=1)
+
+        self.assertEqual(
+            ToDoModel.objects.using(SHARD).get(pk=self.todos[0].pk).title, "fresh"
+        )
+
+
+@override_settings(TODOS_SYNC_PAGE_SIZE=2)
+class SyncTests(TestCase):
+    databases = {"default", SHARD}
+
+    def setUp(self):
+        getCache().clear()
+        self.user = userOn(SHARD, "syncer")
+        self.client.force_login(self.user)
+        self.todos = [createTodo(self.user, f"todo {n}") for n in range(3)]
+
+    def sync(self, cursor=None, status=200):
+        response = self.client.get(
+            reverse("apiSyncTodos"), {"cursor": cursor} if cursor else {}
+        )
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def drain(self, cursor=None):
+        """Every change after ``cursor``, page by page, and the last cursor."""
+        changes = []
+        while True:
+            page = self.sync(cursor)
+            self.assertLessEqual(len(page["changes"]), 2)
+            changes += page["changes"]
+            cursor = page["cursor"]
+            if not page["more"]:
+                return changes, cursor
+
+    def test_snapshot_lists_every_todo(self):
+        changes, _ = self.drain()
+        self.assertEqual(
+            [change["title"] for change in changes], ["todo 0", "todo 1", "todo 2"]
+        )
+
+    def test_delta_has_only_the_changes_since_the_cursor(self):
+        _, cursor = self.drain()
+        self.assertEqual(self.drain(cursor)[0], [])
+
+        todo = self.todos[1]
+        todo.title = "renamed"
+        todo.save()
+        createTodo(self.user, "added")
+
+        changes, cursor = self.drain(cursor)
+        self.assertEqual([change["title"] for change in changes], ["renamed", "added"])
+        self.assertEqual(self.drain(cursor)[0], [])
+
+    def test_changes_to_one_todo_collapse(self):
+        _, cursor = self.drain()
+        todo = self.todos[0]
+        for title in ("first", "second", "third"):
+            todo.title = title
+            todo.save()
+
+        # Within one page of the log.
+        with self.settings(TODOS_SYNC_PAGE_SIZE=10):
+            changes = self.sync(cursor)["changes"]
+        self.assertEqual([change["title"] for change in changes], ["third"])
+
+    def test_delete_leaves_a_tombstone(self):
+        _, cursor = self.drain()
+        deleted = self.todos[2].pk
+        self.todos[2].delete()
+
+        changes, _ = self.drain(cursor)
+        self.assertEqual(changes, [{"id": deleted, "deleted": True}])
+        tombstone = TodoChange.objects.using(SHARD).get(todo_id=deleted, deleted=True)
+        self.assertEqual(tombstone.user_id, self.user.pk)
+
+        # A fresh snapshot leaves the deleted to-do out.
+        snapshot, _ = self.drain()
+        self.assertNotIn(deleted, [change["id"] for change in snapshot])
+
+    def test_revisions_count_up_per_user(self):
+        other = userOn(SHARD, "other")
+        createTodo(other)
+        self.todos[0].delete()
+
+        revisions = list(
+            TodoChange.objects.using(SHARD)
+            .filter(user=self.user)
+            .order_by("id")
+            .values_list("revision", flat=True)
+        )
+        self.assertEqual(revisions, [1, 2, 3, 4])
+        self.assertEqual(
+            list(
+                TodoChange.objects.using(SHARD)
+                .filter(user=other)
+                .values_list("revision", flat=True)
+            ),
+            [1],
+        )
+
+    def test_pruned_cursor_needs_a_resync(self):
+        _, cursor = self.drain()
+        createTodo(self.user, "pruned")
+        pruneChanges(SHARD, timezone.now() + timedelta(seconds=1))
+
+        self.assertIn("error", self.sync(cursor, status=410))
+        self.assertIn("error", self.sync("garbage", status=400))
+
+
+@override_settings(
+    TODOS_EVENTS_HEARTBEAT=0.05, TODOS_EVENTS_MAX_AGE=0.5, TODOS_EVENTS_RETRY=1
+)
+class EventStreamTests(TransactionTestCase):
+    # The stream reads the change log on other threads.
+    databases = {"default", SHARD}
+
+    def setUp(self):
+        getCache().clear()
+        self.user = userOn(SHARD, "listener")
+        self.client.force_login(self.user)
+
+    def cursor(self):
+        return encodeSyncCursor(syncState(self.user.pk)[0])
+
+    def stream(self, headers=None, during=None, login=True):
+        """
+        Run one stream until it ends by itself (TODOS_EVENTS_MAX_AGE),
+        calling ``during`` once it is open. Returns the status and the body.
+        """
+        headers = dict(headers or {})
+        if login:
+            name = settings.SESSION_COOKIE_NAME
+            headers["Cookie"] = f"{name}={self.client.cookies[name].value}"
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": reverse("apiTodoEvents"),
+            "query_string": b"",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        }
+        messages = []
+
+        async def receive():
+            # The client never goes away.
+            await asyncio.Event().wait()
+
+        async def send(message):
+            messages.append(message)
+
+        async def run():
+            task = asyncio.create_task(EventStreamApp(None)(scope, receive, send))
+            if during:
+                await asyncio.sleep(0.1)
+                await sync_to_async(during)()
+            await task
+
+        asyncio.run(run())
+        body = b"".join(message.get("body", b"") for message in messages[1:])
+        return messages[0]["status"], body.decode()
+
+    def events(self, body):
+        return [
+            dict(line.split(": ", 1) for line in message.splitlines())
+            for message in body.split("\n\n")
+            if message.startswith(("id:", "event:"))
+        ]
+
+    def test_changes_are_pushed_while_open(self):
+        status, body = self.stream(during=lambda: createTodo(self.user, "live"))
+        self.assertEqual(status, 200)
+        self.assertTrue(body.startswith("retry: "))
+        self.assertIn(": ping", body)
+        [event] = self.events(body)
+        self.assertEqual(event["event"], "todo")
+        self.assertEqual(json.loads(event["data"])["title"], "live")
+        self.assertIn("id", event)
+
+    def test_reconnect_resumes_from_the_last_event_id(self):
+        cursor = self.cursor()
+        missed = createTodo(self.user, "missed")
+        missedId = missed.pk
+        missed.delete()
+        createTodo(self.user, "kept")
+
+        status, body = self.stream({"Last-Event-ID": cursor})
+        events = self.events(body)
+        self.assertEqual([event["event"] for event in events], ["delete", "todo"])
+        self.assertEqual(json.loads(events[0]["data"]), {"id": missedId})
+        self.assertEqual(json.loads(events[1]["data"])["title"], "kept")
+
+        # Resuming from the last id sent repeats nothing.
+        _, body = self.stream({"Last-Event-ID": events[-1]["id"]})
+        self.assertEqual(self.events(body), [])
+
+    def test_pruned_cursor_needs_a_resync(self):
+        cursor = self.cursor()
+        createTodo(self.user, "pruned")
+        pruneChanges(SHARD, timezone.now() + timedelta(seconds=1))
+
+        status, body = self.stream({"Last-Event-ID": cursor})
+        self.assertEqual(status, 200)
+        self.assertEqual(self.events(body), [{"event": "resync", "data": "{}"}])
+
+    def test_rejected_streams(self):
+        self.assertEqual(self.stream(login=False)[0], 401)
+        self.assertEqual(self.stream({"Last-Event-ID": "garbage"})[0], 400)
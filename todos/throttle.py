@@ -0,0 +1,81 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+
+from .cache import getCache
+
+
+def clientIp(request):
+    header = settings.TODOS_CLIENT_IP_HEADER
+    value = request.META.get(header) if header else None
+    # X-Forwarded-For style headers list the original client first.
+    return (value or request.META.get("REMOTE_ADDR") or "").split(",")[0].strip()
+
+
+class TokenBucket:
+    """
+    A bucket of ``burst`` tokens refilled at ``perMinute`` tokens a minute,
+    kept in the shared cache so every worker draws from the same budget.
+    The read-modify-write is not atomic; concurrent requests can overdraw a
+    bucket by a token or two, which is fine for a CPU guard.
+    """
+
+    def __init__(self, burst, perMinute):
+        self.burst = burst
+        self.rate = perMinute / 60
+
+    def take(self, key, now=None):
+        """Take one token; return 0 on success or the seconds to wait."""
+        cache = getCache()
+        now = time.time() if now is None else now
+        tokens, stamp = cache.get(key) or (self.burst, now)
+        tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+        if tokens < 1:
+            return (1 - tokens) / self.rate
+        # A full bucket is the same as no entry, so let it expire then.
+        timeout = math.ceil((self.burst - tokens + 1) / self.rate)
+        cache.set(key, (tokens - 1, now), timeout=timeout)
+        return 0
+
+
+def bucketKey(scope, kind, value):
+    digest = hashlib.md5(value.encode()).hexdigest()
+    return f"todos:throttle:{scope}:{kind}:{digest}"
+
+
+def throttleWait(scope, request, account):
+    """
+    Charge one attempt at ``scope`` against the client's IP and, when
+    given, the targeted account. Returns the seconds until the attempt
+    would be allowed, or 0.
+    """
+    if not settings.TODOS_THROTTLE_ENABLED:
+        return 0
+    buckets = [
+        (
+            TokenBucket(
+                settings.TODOS_THROTTLE_IP_BURST,
+                settings.TODOS_THROTTLE_IP_PER_MINUTE,
+            ),
+            bucketKey(scope, "ip", clientIp(request)),
+        )
+    ]
+    if account:
+        buckets.append(
+            (
+                TokenBucket(
+                    settings.TODOS_THROTTLE_ACCOUNT_BURST,
+                    settings.TODOS_THROTTLE_ACCOUNT_PER_MINUTE,
+                ),
+                bucketKey(scope, "account", account.strip().lower()),
+            )
+        )
+    # Stop at the first empty bucket so a blocked client cannot also drain
+    # the budget of the account it is targeting.
+    for bucket, key in buckets:
+        wait = bucket.take(key)
+        if wait:
+            return wait
+    return 0
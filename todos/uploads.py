@@ -0,0 +1,138 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.utils import timezone
+
+from .models import ChunkedUpload
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def partPath(upload):
+    return os.path.join(settings.TODOS_UPLOAD_TEMP_DIR, f"{upload.pk}.part")
+
+
+def startUpload(user, todo, filename, size):
+    if size > settings.TODOS_UPLOAD_MAX_SIZE:
+        raise UploadError(
+            f"File exceeds the {settings.TODOS_UPLOAD_MAX_SIZE} byte limit.", 413
+        )
+    upload = ChunkedUpload.objects.create(
+        user=user, todo=todo, filename=os.path.basename(filename), size=size
+    )
+    os.makedirs(settings.TODOS_UPLOAD_TEMP_DIR, exist_ok=True)
+    open(partPath(upload), "wb").close()
+    return upload
+
+
+def writeChunk(upload, start, length, stream):
+    """
+    Copy ``length`` bytes from ``stream`` into the upload's part file at
+    ``start``, reading in small blocks so the chunk is never held in memory.
+    Writing at an explicit offset makes retrying a chunk idempotent.
+    """
+    if upload.completed_at:
+        raise UploadError("Upload already finalized.", 409)
+    if start != upload.offset:
+        raise UploadError(f"Expected offset {upload.offset}.", 409)
+    if length > settings.TODOS_UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError("Chunk too large.", 413)
+    if start + length > upload.size:
+        raise UploadError("Chunk extends past the declared file size.", 416)
+
+    written = 0
+    with open(partPath(upload), "r+b") as part:
+        part.seek(start)
+        while written < length:
+            block = stream.read(min(READ_BLOCK_SIZE, length - written))
+            if not block:
+                break
+            part.write(block)
+            written += len(block)
+    if written != length:
+        raise UploadError("Chunk body shorter than Content-Length.")
+
+    # Conditional update so concurrent retries can only move the offset forward.
+    ChunkedUpload.objects.filter(pk=upload.pk, offset=start).update(
+        offset=start + written
+    )
+    upload.refresh_from_db(fields=["offset"])
+    return upload.offset
+
+
+def moveIntoStorage(upload, fieldFile):
+    """
+    Move the part file to its place in a local storage, which is a rename
+    when both are on the same filesystem. Returns False for storages
+    without local paths.
+    """
+    storage = fieldFile.storage
+    name = fieldFile.field.generate_filename(fieldFile.instance, upload.filename)
+    try:
+        storage.path(name)
+    except NotImplementedError:
+        return False
+    while True:
+        name = storage.get_available_name(name, max_length=fieldFile.field.max_length)
+        path = storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            file_move_safe(partPath(upload), path, allow_overwrite=False)
+            break
+        except FileExistsError:
+            # Taken since get_available_name(); pick another name.
+            pass
+    mode = getattr(storage, "file_permissions_mode", None)
+    if mode is not None:
+        os.chmod(path, mode)
+    fieldFile.name = name
+    return True
+
+
+def finalizeUpload(upload):
+    if upload.completed_at:
+        raise UploadError("Upload already finalized.", 409)
+    if upload.offset != upload.size:
+        raise UploadError(
+            f"Upload incomplete: {upload.offset}/{upload.size} bytes.", 409
+        )
+
+    todo = upload.todo
+    if not moveIntoStorage(upload, todo.file):
+        with open(partPath(upload), "rb") as part:
+            todo.file.save(upload.filename, File(part), save=False)
+        os.remove(partPath(upload))
+    todo.save(update_fields=["file", "updated_at"])
+    upload.completed_at = timezone.now()
+    upload.save(update_fields=["completed_at"])
+    return todo
+
+
+def discardUpload(upload):
+    try:
+        os.remove(partPath(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def parseContentRange(header):
+    # "bytes <start>-<end>/<total>"
+    try:
+        unit, spec = header.split(" ", 1)
+        span, total = spec.split("/", 1)
+        start, end = (int(x) for x in span.split("-", 1))
+        total = int(total)
+    except ValueError:
+        raise UploadError("Malformed Content-Range header.")
+    if unit != "bytes" or start > end:
+        raise UploadError("Malformed Content-Range header.")
+    return start, end - start + 1, total
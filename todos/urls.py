@@ -1,7 +1,5 @@
 from django.urls import path
-from django.conf import settings
-from django.conf.urls.static import static
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("", views.loginUser, name="loginUser"),
@@ -10,9 +8,29 @@ urlpatterns = [
     path("create", views.createTodos, name="createTodos"),
     path("info", views.viewAll, name="viewAll"),
     path("info/<int:pk>", views.viewOne, name="viewOne"),
+    path("search", views.searchTodos, name="searchTodos"),
+    path("export", views.exportTodos, name="exportTodos"),
+    path("import", views.importTodos, name="importTodos"),
+    path("archive", views.viewArchive, name="viewArchive"),
     path("update/<int:pk>", views.updateOne, name="updateOne"),
     path("delete/<int:pk>", views.deleteOne, name="deleteOne"),
     path("reset_password/", views.resetPassword, name="resetPassword"),
     path("change_password/", views.changePassword, name="changePassword"),
     path("user_detail/<int:pk>", views.viewUserDetail, name="viewUserDetail"),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path("api/todos", api.listTodos, name="apiListTodos"),
+    path("api/todos/<int:pk>", api.getTodo, name="apiGetTodo"),
+    path("api/todos/batch", api.batchTodos, name="apiBatchTodos"),
+    path("api/todos/sync", api.syncTodos, name="apiSyncTodos"),
+    path("api/todos/events", api.todoEvents, name="apiTodoEvents"),
+    path("api/cache_stats", api.cacheStatistics, name="apiCacheStats"),
+    path("api/db_stats", api.dbStatistics, name="apiDbStats"),
+    path("api/timing_stats", api.timingStatistics, name="apiTimingStats"),
+    path("api/auth_stats", api.authStatistics, name="apiAuthStats"),
+    path("api/uploads", api.createUpload, name="apiCreateUpload"),
+    path("api/uploads/<uuid:pk>", api.uploadDetail, name="apiUploadDetail"),
+    path(
+        "api/uploads/<uuid:pk>/finalize",
+        api.finalizeUploadView,
+        name="apiFinalizeUpload",
+    ),
+]
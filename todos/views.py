@@ -1,14 +1,56 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import os
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.urls import reverse
 from django.contrib.auth import login, logout, authenticate, get_user_model
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ValidationError
 
-from .models import ToDoModel, User
-from .forms import ToDoForm, UserLoginForm, UserRegistrationForm, PasswordChangeForm
+from .cache import cache_per_user
+from .counters import getCounters, userTodos
+from .decorators import async_login_required, conditional_view, throttle_hashing
+from .etags import listValidators, todoValidators
+from .export import ASYNC_STREAMS, CONTENT_TYPES, STREAMS, aexportRows, exportRows
+from .importer import PARSERS, runImport, textStream
+from .media import mediaResponse, ownsMedia
+from .models import ArchivedTodo, Priority, Status, ToDoModel, User
+from .forms import (
+    ToDoForm,
+    UserLoginForm,
+    UserRegistrationForm,
+    PasswordChangeForm,
+    TodoFilterForm,
+    TodoSearchForm,
+    TodoImportForm,
+)
+from .pagination import DEFAULT_SORT, InvalidCursor, akeysetPage, keysetPage
+from .sync import encodeSyncCursor, syncState
 
 User = get_user_model()
 
+# Columns the list page shows; rows are fetched as dicts, not instances.
+LIST_FIELDS = ("id", "title", "priority", "status", "dueDate")
+PRIORITY_LABELS = dict(Priority.choices)
+STATUS_LABELS = dict(Status.choices)
+
+
+def urlPrefix(name):
+    # Reverse once per render; rows append their own id.
+    return reverse(name, args=[0]).removesuffix("0")
+
+
+def listRows(rows):
+    for row in rows:
+        row["priority_display"] = PRIORITY_LABELS.get(row["priority"], row["priority"])
+        row["status_display"] = STATUS_LABELS.get(row["status"], row["status"])
+    return rows
+
 
 @login_required
 def createTodos(request):
@@ -25,26 +67,154 @@ def createTodos(request):
     return render(request, "todos/createTodos.html", {"form": form})
 
 
-@login_required
-def viewAll(request):
+@async_login_required
+@conditional_view(listValidators)
+@cache_per_user("viewAll")
+async def viewAll(request):
+    filterForm = TodoFilterForm(request.GET or None)
+    todos = ToDoModel.objects.filter(user=request.user)
+    sort, cursor = DEFAULT_SORT, None
+    if filterForm.is_bound:
+        if filterForm.is_valid():
+            todos = filterForm.filter(todos)
+            sort = filterForm.cleaned_data.get("sort") or DEFAULT_SORT
+            cursor = filterForm.cleaned_data.get("cursor")
+        else:
+            messages.error(request, "Invalid filter.")
+
+    todos = todos.values(*LIST_FIELDS)
     try:
-        todos = ToDoModel.objects.filter(user=request.user)
-    except ToDoModel.DoesNotExist:
-        todos = None
-        messages.error(request, "No to-dos found.")
-    return render(request, "todos/viewTodos.html", {"dataset": todos})
+        todos, nextCursor = await akeysetPage(
+            todos, sort=sort, cursor=cursor, pageSize=settings.TODOS_PAGE_SIZE
+        )
+    except InvalidCursor:
+        messages.error(request, "Invalid page cursor, showing the first page.")
+        todos, nextCursor = await akeysetPage(
+            todos, sort=sort, pageSize=settings.TODOS_PAGE_SIZE
+        )
+
+    nextQuery = None
+    if nextCursor:
+        query = request.GET.copy()
+        query["cursor"] = nextCursor
+        nextQuery = query.urlencode()
+    firstQuery = request.GET.copy()
+    firstQuery.pop("cursor", None)
+    counters = await sync_to_async(getCounters)(request.user.pk)
+    # Live updates start after the changes this page already shows.
+    revision, _ = await sync_to_async(syncState)(request.user.pk)
+    return render(
+        request,
+        "todos/viewTodos.html",
+        {
+            "dataset": listRows(todos),
+            "rowUrls": {
+                name: urlPrefix(name) for name in ("deleteOne", "updateOne", "viewOne")
+            },
+            "counters": counters,
+            "filterForm": filterForm,
+            "nextQuery": nextQuery,
+            "firstQuery": firstQuery.urlencode(),
+            "isFirstPage": not cursor,
+            "syncCursor": encodeSyncCursor(revision),
+        },
+    )
 
 
 @login_required
-def viewOne(request, pk):
-    try:
-        todo = get_object_or_404(ToDoModel, id=pk, user=request.user)
-    except ToDoModel.DoesNotExist:
-        messages.error(request, "To-do not found.")
-        return redirect("viewAll")
+def searchTodos(request):
+    form = TodoSearchForm(request.GET or None)
+    results = None
+    if form.is_valid():
+        results = ToDoModel.objects.filter(user=request.user).search(
+            form.cleaned_data["q"]
+        )[: settings.TODOS_PAGE_SIZE]
+    return render(request, "todos/searchTodos.html", {"form": form, "dataset": results})
+
+
+@login_required
+def exportTodos(request):
+    exportFormat = request.GET.get("format", "csv")
+    if exportFormat not in STREAMS:
+        return HttpResponseBadRequest("Unsupported export format.")
+    filterForm = TodoFilterForm(request.GET)
+    if not filterForm.is_valid():
+        return HttpResponseBadRequest("Invalid filter.")
+
+    # The rows are read after the view returns, outside the request's
+    # routing; the hint keeps them on the user's shard.
+    todos = filterForm.filter(userTodos(request.user.pk).filter(user=request.user))
+    chunkSize = settings.TODOS_EXPORT_CHUNK_SIZE
+    if isinstance(request, ASGIRequest):
+        content = ASYNC_STREAMS[exportFormat](aexportRows(todos, chunkSize))
+    else:
+        content = STREAMS[exportFormat](exportRows(todos, chunkSize))
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[exportFormat])
+    response["Content-Disposition"] = f'attachment; filename="todos.{exportFormat}"'
+    return response
+
+
+@login_required
+def importTodos(request):
+    form = TodoImportForm(request.POST or None, request.FILES or None)
+    report = None
+    if form.is_valid():
+        parse = PARSERS[form.cleaned_data["format"]]
+        report = runImport(
+            request.user,
+            parse(textStream(form.cleaned_data["file"].file)),
+            batchSize=settings.TODOS_IMPORT_BATCH_SIZE,
+            maxErrors=settings.TODOS_IMPORT_MAX_REPORTED_ERRORS,
+        )
+        if report.created:
+            messages.success(request, f"Imported {report.created} to-dos.")
+        if report.failed:
+            messages.error(request, f"{report.failed} rows could not be imported.")
+    return render(
+        request,
+        "todos/importTodos.html",
+        {
+            "form": form,
+            "report": report,
+            "errors": report.errors if report else None,
+        },
+    )
+
+
+@async_login_required
+@conditional_view(todoValidators)
+@cache_per_user("viewOne")
+async def viewOne(request, pk):
+    todo = await aget_object_or_404(ToDoModel, id=pk, user=request.user)
     return render(request, "todos/viewOne.html", {"data": todo})
 
 
+@login_required
+def viewArchive(request):
+    todos = ArchivedTodo.objects.filter(user=request.user)
+    try:
+        dataset, nextCursor = keysetPage(
+            todos,
+            sort="-dueDate",
+            cursor=request.GET.get("cursor"),
+            pageSize=settings.TODOS_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        messages.error(request, "Invalid page cursor, showing the first page.")
+        dataset, nextCursor = keysetPage(
+            todos, sort="-dueDate", pageSize=settings.TODOS_PAGE_SIZE
+        )
+    return render(
+        request,
+        "todos/archiveTodos.html",
+        {
+            "dataset": dataset,
+            "nextCursor": nextCursor,
+            "isFirstPage": "cursor" not in request.GET,
+        },
+    )
+
+
 @login_required
 def updateOne(request, pk):
     try:
@@ -82,6 +252,7 @@ def deleteOne(request, pk):
     return render(request, "todos/deleteTodo.html", {"todo": todo})
 
 
+@throttle_hashing("loginUser", "username")
 def loginUser(request):
     if request.method == "POST":
         form = UserLoginForm(request.POST)
@@ -100,21 +271,18 @@ def loginUser(request):
     return render(request, "todos/login.html", {"form": form})
 
 
+@throttle_hashing("registerUser", "email")
 def registerUser(request):
     if request.method == "POST":
         form = UserRegistrationForm(request.POST)
         if form.is_valid():
             try:
-                form.save()
-                username = form.cleaned_data.get("username")
-                password = form.cleaned_data.get("password1")
-                user = authenticate(request, username=username, password=password)
-                if user is not None:
-                    login(request, user)
-                    messages.success(request, "Registered and logged in successfully!")
-                    return redirect("viewAll")
-                else:
-                    messages.error(request, "Registration failed. Please try again.")
+                # Log the new user in directly; authenticate() would hash the
+                # password a second time just to get the same user back.
+                user = form.save()
+                login(request, user)
+                messages.success(request, "Registered and logged in successfully!")
+                return redirect("viewAll")
             except ValidationError as e:
                 messages.error(request, f"Error during registration: {e}")
     else:
@@ -129,6 +297,7 @@ def logoutUser(request):
     return redirect("loginUser")
 
 
+@throttle_hashing("resetPassword", "email")
 def resetPassword(request):
     if request.method == "POST":
         email = request.POST.get("email")
@@ -146,6 +315,7 @@ def resetPassword(request):
     return render(request, "todos/resetPassword.html")
 
 
+@throttle_hashing("changePassword", "email")
 def changePassword(request):
     if request.method == "POST":
         form = PasswordChangeForm(request.POST)
@@ -171,11 +341,17 @@ def changePassword(request):
     return render(request, "todos/changePassword.html", {"form": form})
 
 
-@login_required
-def viewUserDetail(request, pk):
-    try:
-        user = get_object_or_404(User, id=pk)
-    except User.DoesNotExist:
-        messages.error(request, "User does not exist")
-        return redirect("registerUser")
+@async_login_required
+async def viewUserDetail(request, pk):
+    user = await aget_object_or_404(User, id=pk)
     return render(request, "todos/viewUserDetail.html", {"user": user})
+
+
+@login_required
+def serveMedia(request, path):
+    if not ownsMedia(request.user, path):
+        raise Http404("File not found.")
+    fullPath = default_storage.path(path)
+    if not os.path.isfile(fullPath):
+        raise Http404("File not found.")
+    return mediaResponse(request, path, fullPath)